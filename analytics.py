@@ -7,14 +7,41 @@ Original file is located at
     https://colab.research.google.com/drive/1LZGAb1QqmFbxPOvr0RgntQ7s8bG1G1UQ
 """
 
+import numpy as np
 import pandas as pd
+from matchup_index import matchup_positions, select_matchup, select_team
+from metadata import canonical_name, resolve_team
+from form import team_form, head_to_head_form, home_away_form
+from outcomes import outcome_letters
 
 def get_column_names(version):
     return ("Home", "Away", "Res") if version == "v2" else ("HomeTeam", "AwayTeam", "FTR")
 
-def calculate_probabilities(home, away, data, version="v1"):
+def resolve_names(index, *names):
+    """The dataset's spelling of each team name or alias, via the index's
+    metadata (unchanged without an index)."""
+    if index is None:
+        return names
+    return tuple(canonical_name(index["metadata"], name) for name in names)
+
+def resolve_ids(index, *names):
+    """The metadata team ID of each team name or alias, for the index, form
+    and outcome lookups; names the metadata does not know (or every name,
+    without an index) are returned as given."""
+    if index is None:
+        return names
+    ids = [resolve_team(index["metadata"], name) for name in names]
+    return tuple(name if i is None else i for name, i in zip(names, ids))
+
+def as_dates(values):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    return pd.to_datetime(values, dayfirst=True, errors="coerce")
+
+def calculate_probabilities(home, away, data, version="v1", index=None):
+    home, away = resolve_ids(index, home, away)
     home_col, away_col, result_col = get_column_names(version)
-    h2h = data[(data[home_col] == home) & (data[away_col] == away)]
+    h2h = select_matchup(home, away, data, get_column_names, version, index)
     if h2h.empty:
         return None
     total = len(h2h)
@@ -24,55 +51,60 @@ def calculate_probabilities(home, away, data, version="v1"):
         "Away Team Win": (h2h[result_col] == 'A').sum() / total * 100,
     }
 
-def get_head_to_head_history(home, away, data, version="v1"):
+def get_head_to_head_history(home, away, data, version="v1", index=None):
+    home, away = resolve_ids(index, home, away)
     home_col, away_col, result_col = get_column_names(version)
-    h2h = data[(data[home_col] == home) & (data[away_col] == away)]
+    h2h = select_matchup(home, away, data, get_column_names, version, index)
     if 'Date' in h2h.columns:
-        h2h['Date'] = pd.to_datetime(h2h['Date'], errors='coerce')
+        h2h['Date'] = as_dates(h2h['Date'])
     return h2h[['Date', result_col]].dropna()
 
-def get_recent_team_form(home, away, data, version="v1"):
+def get_recent_team_form(home, away, data, version="v1", index=None, form_state=None):
+    home_id, away_id = resolve_ids(index, home, away)
+    if form_state is not None:
+        return home_away_form(form_state, version, home_id, away_id)
+    home, away = resolve_names(index, home, away)
     home_col, away_col, result_col = get_column_names(version)
-    home_matches = data[data[home_col] == home].sort_values(by='Date', ascending=False).head(5)
-    away_matches = data[data[away_col] == away].sort_values(by='Date', ascending=False).head(5)
-    home_form = "".join(home_matches[result_col].fillna("-").values)
-    away_form = "".join(away_matches[result_col].fillna("-").values)
+    home_matches = select_team(home_id, data, get_column_names, version, index)
+    away_matches = select_team(away_id, data, get_column_names, version, index)
+    home_matches = home_matches[home_matches[home_col] == home].sort_values(by='Date', ascending=False).head(5)
+    away_matches = away_matches[away_matches[away_col] == away].sort_values(by='Date', ascending=False).head(5)
+    home_form = "".join(home_matches[result_col].astype(object).fillna("-").values)
+    away_form = "".join(away_matches[result_col].astype(object).fillna("-").values)
     return home_form, away_form
 
-def get_head_to_head_form(home_team, away_team, data, version="v1"):
+def get_head_to_head_form(home_team, away_team, data, version="v1", index=None, form_state=None):
+    home_id, away_id = resolve_ids(index, home_team, away_team)
+    if form_state is not None:
+        return head_to_head_form(form_state, version, home_id, away_id)
+    home_team, away_team = resolve_names(index, home_team, away_team)
     home_col, away_col, result_col = get_column_names(version)
+    if index is not None:
+        rows = np.sort(np.concatenate([matchup_positions(index, version, home_id, away_id),
+                                       matchup_positions(index, version, away_id, home_id)]))
+        data = data.take(rows)
     df = data[[home_col, away_col, result_col, "Date"]].copy()
-    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+    df["Date"] = as_dates(df["Date"])
     df = df.dropna(subset=["Date"])
     h2h = df[((df[home_col] == home_team) & (df[away_col] == away_team)) |
              ((df[home_col] == away_team) & (df[away_col] == home_team))].sort_values("Date", ascending=False).head(5)
 
-    home_form, away_form = [], []
-    for _, row in h2h.iterrows():
-        result = row[result_col]
-        h, a = row[home_col], row[away_col]
-        home_form.append("W" if ((home_team == h and result == "H") or (home_team == a and result == "A"))
-                         else "D" if result == "D" else "L")
-        away_form.append("W" if ((away_team == h and result == "H") or (away_team == a and result == "A"))
-                         else "D" if result == "D" else "L")
-    return "".join(home_form), "".join(away_form)
+    results = h2h[result_col]
+    return (outcome_letters(results, (h2h[home_col] == home_team).to_numpy()),
+            outcome_letters(results, (h2h[home_col] == away_team).to_numpy()))
 
-def get_team_recent_form(team_name, data, version="v1"):
+def get_team_recent_form(team_name, data, version="v1", index=None, form_state=None):
+    team_id, = resolve_ids(index, team_name)
+    if form_state is not None:
+        return team_form(form_state, version, team_id)
+    team_name, = resolve_names(index, team_name)
     home_col, away_col, result_col = get_column_names(version)
+    if index is not None:
+        data = select_team(team_id, data, get_column_names, version, index)
     df = data[[home_col, away_col, result_col, "Date"]].copy()
-    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+    df["Date"] = as_dates(df["Date"])
     df = df.dropna(subset=["Date"])
     recent_matches = df[(df[home_col] == team_name) | (df[away_col] == team_name)]
     recent_matches = recent_matches.sort_values("Date", ascending=False).head(5)
 
-    form = []
-    for _, row in recent_matches.iterrows():
-        result = row[result_col]
-        is_home = row[home_col] == team_name
-        if result == "D":
-            form.append("D")
-        elif (result == "H" and is_home) or (result == "A" and not is_home):
-            form.append("W")
-        else:
-            form.append("L")
-    return "".join(form)
\ No newline at end of file
+    return outcome_letters(recent_matches[result_col], (recent_matches[home_col] == team_name).to_numpy())
\ No newline at end of file
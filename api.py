@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""api.py
+
+Headless JSON prediction service on top of controller.run_prediction.
+
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+Handlers are async; the pandas/model work runs on a thread pool and finished
+responses are kept in an LRU/TTL cache. Data and models come from a
+store.Store, which swaps in changed files in the background (or on POST
+/reload); responses are cached under the store's dependency key for what
+they read (the dataset for /form, /h2h and /table, plus the model and
+prediction table for /predict), so a swap only misses for the responses
+whose inputs changed. When a prediction table built by precompute.py matches
+the loaded dataset, /predict answers from it without calling a model. GET
+/table returns a league table built in one pass by outcomes.league_table.
+"""
+
+import os
+import asyncio
+import datetime
+import contextvars
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+import metrics
+from analytics import get_head_to_head_history, get_head_to_head_form, get_team_recent_form, resolve_names
+from batch import OUTCOME_LABELS
+from cache import TTLCache
+from controller import run_prediction
+from metadata import league_teams, league_version
+from model_registry import warm_up
+from outcomes import league_table
+from precompute import lookup
+from store import DATA, PREDICTIONS, Store
+
+API_WORKERS = int(os.environ.get("API_WORKERS", "4"))
+API_CACHE_SIZE = int(os.environ.get("API_CACHE_SIZE", "4096"))
+API_CACHE_TTL = float(os.environ.get("API_CACHE_TTL", "3600"))
+NO_HISTORY = "No historical data available for this matchup."
+
+_executor = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix="api")
+_cache = TTLCache(API_CACHE_SIZE, API_CACHE_TTL)
+_store = Store()
+_MISSING = object()
+
+def current_state():
+    return _store.snapshot()
+
+def resolve_version(league=None, version=None):
+    if version:
+        if version not in ("v1", "v2"):
+            raise HTTPException(400, f"Unknown version {version!r}")
+        return version
+    if league:
+        resolved = league_version(current_state()["metadata"], league)
+        if resolved is None:
+            raise HTTPException(404, f"Unknown league {league!r}")
+        return resolved
+    raise HTTPException(400, "Pass either league or version")
+
+def head_to_head_records(h2h):
+    result_col = "FTR" if "FTR" in h2h.columns else "Res"
+    return [{"date": date.date().isoformat(), "result": result}
+            for date, result in zip(h2h["Date"], h2h[result_col].astype(object))]
+
+def predict_pair(state, home, away, version):
+    home, away = resolve_names(state["index"], home, away)
+    precomputed = lookup(state["predictions"], version, home, away)
+    metrics.count("prediction_table_hit" if precomputed is not None else "prediction_table_miss")
+    if precomputed is not None:
+        if not precomputed["matches"]:
+            return None
+        final, full_conf, probs = precomputed["final"], precomputed["model_confidence"], precomputed["probabilities"]
+        home_form, away_form = precomputed["home_form"], precomputed["away_form"]
+        with metrics.stage("h2h"):
+            h2h = get_head_to_head_history(home, away, state["data"], version, index=state["index"])
+    else:
+        with metrics.stage("model_load"):
+            model, table = _store.model(state, version), _store.feature_table(state, version)
+        final, full_conf, probs, home_form, away_form, h2h = run_prediction(
+            home, away, model, state["data"], version, index=state["index"],
+            feature_table=table, form_state=state["form_state"])
+        if final is None:
+            return None
+    return {
+        "home": home,
+        "away": away,
+        "version": version,
+        "data_version": state["data_version"],
+        "prediction": final,
+        "model_confidence": {OUTCOME_LABELS.get(k, str(k)): float(v) for k, v in (full_conf or {}).items()},
+        "historical_probabilities": {k: float(v) for k, v in probs.items()},
+        "form": {"home": home_form, "away": away_form},
+        "head_to_head": head_to_head_records(h2h),
+    }
+
+def team_form(state, team, version):
+    form = get_team_recent_form(team, state["data"], version, index=state["index"], form_state=state["form_state"])
+    return {"team": team, "version": version, "data_version": state["data_version"], "form": form}
+
+def head_to_head(state, home, away, version):
+    h2h = get_head_to_head_history(home, away, state["data"], version, index=state["index"])
+    home_form, away_form = get_head_to_head_form(home, away, state["data"], version, index=state["index"],
+                                                 form_state=state["form_state"])
+    return {
+        "home": home,
+        "away": away,
+        "version": version,
+        "data_version": state["data_version"],
+        "form": {"home": home_form, "away": away_form},
+        "matches": head_to_head_records(h2h),
+    }
+
+def standings(state, league, version, since=None, last=None):
+    teams = league_teams(state["metadata"], league)
+    table = league_table(state["outcomes"], version, teams, since=since, last=last)
+    return {
+        "league": league,
+        "version": version,
+        "data_version": state["data_version"],
+        "since": since.isoformat() if since else None,
+        "last": last,
+        "table": table.to_dict(orient="records"),
+    }
+
+async def run_cached(key, depends, fn, *args):
+    state = current_state()
+    with metrics.request(f"api.{key[0]}", version=key[1]):
+        metrics.observe("dataset_rows", len(state["data"]))
+        key = key + _store.dependency_key(state, *depends)
+        result = _cache.get(key, _MISSING)
+        if result is _MISSING:
+            metrics.count("response_cache_miss")
+            # Run in a copy of this context so stages recorded on the worker thread land in this request's trace.
+            context = contextvars.copy_context()
+            result = await asyncio.get_running_loop().run_in_executor(_executor, context.run, fn, state, *args)
+            _cache.put(key, result)
+        else:
+            metrics.count("response_cache_hit")
+    return result
+
+@asynccontextmanager
+async def lifespan(app):
+    await asyncio.get_running_loop().run_in_executor(_executor, _store.snapshot)
+    warm_up()
+    _store.start()
+    yield
+    _store.stop()
+    _executor.shutdown(wait=False)
+
+app = FastAPI(title="Football Predictor API", lifespan=lifespan)
+
+@app.get("/health")
+async def health():
+    state = current_state()
+    return {"status": "ok", "version": state["version"], "data_version": state["data_version"],
+            "rows": len(state["data"]),
+            "cache": {"size": len(_cache), "hits": _cache.hits, "misses": _cache.misses}}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.REGISTRY.prometheus_text(), media_type="text/plain; version=0.0.4")
+
+@app.get("/predict")
+async def predict(home: str, away: str, league: str = None, version: str = None):
+    version = resolve_version(league, version)
+    result = await run_cached(("predict", version, home, away), (DATA, PREDICTIONS, ("model", version)),
+                              predict_pair, home, away, version)
+    if result is None:
+        raise HTTPException(404, NO_HISTORY)
+    return result
+
+@app.get("/form/{team}")
+async def form(team: str, league: str = None, version: str = None):
+    version = resolve_version(league, version)
+    return await run_cached(("form", version, team), (DATA,), team_form, team, version)
+
+@app.get("/h2h")
+async def h2h(home: str, away: str, league: str = None, version: str = None):
+    version = resolve_version(league, version)
+    return await run_cached(("h2h", version, home, away), (DATA,), head_to_head, home, away, version)
+
+@app.get("/table")
+async def table(league: str, since: datetime.date | None = None, last: int | None = Query(None, ge=1)):
+    version = resolve_version(league)
+    return await run_cached(("table", version, league, since, last), (DATA,), standings, league, version, since, last)
+
+@app.post("/reload")
+async def reload():
+    state = await asyncio.get_running_loop().run_in_executor(_executor, _store.refresh)
+    return {"status": "reloaded", "version": state["version"], "data_version": state["data_version"],
+            "rows": len(state["data"])}
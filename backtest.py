@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""backtest.py
+
+Walk-forward backtest of the prediction pipeline over the historical data.
+
+    python backtest.py                              # bundled models, all matches
+    python backtest.py --since 2023-07-01 --workers 8 -o backtest.csv
+    python backtest.py --model v2=candidate.pkl --check 200
+
+Every match is scored as if it were the next fixture: the model input is the
+mean of the pair's earlier meetings (the feature_table / compute_mean_for_teams
+features) and the historical probabilities come from the same earlier meetings
+(calculate_probabilities), so nothing on or after the match date leaks in.
+Both are computed for every match at once from per-pair cumulative sums; the
+per-match model calls and determine_final_prediction run in a process pool,
+one shard per league and season, reading the prepared arrays from memmapped
+.npy files instead of receiving copies of the data.
+
+Matches with no earlier meeting are counted but not scored, as the app shows
+"no historical data" for them. Accuracy and log-loss are reported per league
+and season; "final" is determine_final_prediction's answer, which counts as a
+hit when the result is one of the outcomes it names.
+"""
+
+import os
+import sys
+import json
+import random
+import logging
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from analytics import calculate_probabilities, get_column_names
+from batch import OUTCOMES, OUTCOME_LABELS, RESULT_CODES
+from data_loader import load_dataset
+from feature_table import source_columns
+from metadata import LEAGUE_COLUMNS
+from model_registry import load_model_file, serving_model
+from model_utils import compute_mean_for_teams, determine_final_prediction
+
+VERSIONS = ("v1", "v2")
+RESULT_INDEX = {code: i for i, code in enumerate(RESULT_CODES)}
+EPS = 1e-15
+
+def season_of(dates):
+    # Seasons run July to June, e.g. 2023-08-12 -> "2023/2024".
+    start = dates.dt.year - (dates.dt.month < 7)
+    return start.astype("Int64").astype(str) + "/" + (start + 1).astype("Int64").astype(str)
+
+def shard_labels(rows, version):
+    """League and season labels for one schema's rows. Leagues are named as
+    in metadata (Country + League, or Div), so leagues of the same name in
+    different countries stay apart; rows without a Season (the v1 rows of
+    the combined frame) take it from their date."""
+    columns = [c for c in LEAGUE_COLUMNS[version] if c in rows]
+    league = pd.Series(version, index=rows.index)
+    for i, col in enumerate(columns):
+        part = rows[col].astype(object).fillna("?").astype(str)
+        league = part if i == 0 else league + " " + part
+    season = season_of(rows["Date"])
+    if "Season" in rows:
+        season = rows["Season"].astype(object).where(rows["Season"].notna(), season)
+    return league, season.astype(object).fillna("?").astype(str)
+
+def prior_history(data, version, sources):
+    """For every match of one schema: means of each source column over the
+    pair's meetings strictly before the match date, the H/D/A counts of those
+    meetings and their number. Returns (positions, means, results, totals)."""
+    home_col, away_col, result_col = get_column_names(version)
+    mask = (data[home_col].notna() & data[away_col].notna() & data["Date"].notna()).to_numpy()
+    positions = np.flatnonzero(mask)
+    rows = data.take(positions)
+
+    values = rows.reindex(columns=sources).to_numpy(dtype=np.float64, na_value=np.nan)
+    present = ~np.isnan(values)
+    result = rows[result_col].astype(object)
+    frame = pd.DataFrame(np.hstack([
+        np.where(present, values, 0.0),
+        present,
+        np.column_stack([(result == code).to_numpy() for code in RESULT_CODES]),
+        np.ones((len(rows), 1)),
+    ]))
+    pair = pd.MultiIndex.from_arrays([rows[home_col], rows[away_col]]).codes
+    frame["pair"] = pair[0].astype(np.int64) * (len(pair[1]) + 1) + pair[1]
+    frame["date"] = rows["Date"].to_numpy()
+
+    # Sum each pair's matches per date, then an exclusive running total per
+    # pair: matches on the same date never see each other.
+    grouped = frame.groupby(["pair", "date"], sort=True)
+    daily = grouped.sum()
+    prior = (daily.groupby(level="pair").cumsum() - daily).to_numpy()[grouped.ngroup().to_numpy()]
+
+    k = len(sources)
+    sums, counts = prior[:, :k], prior[:, k:2 * k]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, sums / counts, np.nan).astype(np.float32)
+    return positions, means, prior[:, 2 * k:2 * k + 3], prior[:, -1].astype(np.int64)
+
+def prepare(data, models, since=None):
+    """Per-version arrays for the matches to score plus their shard labels."""
+    prepared = {}
+    for version in VERSIONS:
+        home_col, away_col, result_col = get_column_names(version)
+        if home_col not in data or version not in models:
+            continue
+        columns = list(models[version].feature_names_in_)
+        sources = source_columns(data, columns)
+        positions, means, results, totals = prior_history(data, version, sources)
+        rows = data.take(positions)
+        actual = rows[result_col].astype(object).map(RESULT_INDEX).fillna(-1).to_numpy(dtype=np.int8)
+        league, season = shard_labels(rows, version)
+        keep = actual >= 0
+        if since is not None:
+            keep &= (rows["Date"] >= pd.Timestamp(since)).to_numpy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            hist = results / totals[:, np.newaxis] * 100
+        prepared[version] = {
+            "columns": columns,
+            "source_idx": np.array([columns.index(c) for c in sources], dtype=np.intp),
+            "positions": positions[keep],
+            "means": means[keep],
+            "hist": hist[keep],
+            "totals": totals[keep],
+            "actual": actual[keep],
+            "league": league.to_numpy()[keep],
+            "season": season.to_numpy()[keep],
+        }
+    return prepared
+
+def hit(final, actual):
+    return OUTCOMES[actual] in final.replace(" (Uncertain)", "").split(" or ")
+
+_worker = {}
+
+def _init_worker(model_files, engine):
+    _worker.update(model_files=model_files, engine=engine, models={})
+
+def _worker_model(version):
+    models = _worker["models"]
+    if version not in models:
+        path = _worker["model_files"].get(version)
+        models[version] = load_model_file(path) if path else serving_model(version, _worker["engine"])
+    return models[version]
+
+def score_shard(workdir, version, start, stop):
+    arrays = {name: np.load(os.path.join(workdir, f"{version}.{name}.npy"), mmap_mode="r")
+              for name in ("means", "hist", "actual", "source_idx")}
+    with open(os.path.join(workdir, f"{version}.columns.json")) as f:
+        columns = json.load(f)
+    model = _worker_model(version)
+    X = np.zeros((stop - start, len(columns)), dtype=np.float32)
+    X[:, arrays["source_idx"]] = arrays["means"][start:stop]
+    X = pd.DataFrame(X, columns=columns)
+    preds = model.predict(X)
+    proba = model.predict_proba(X)
+    hist = np.asarray(arrays["hist"][start:stop])
+    actual = np.asarray(arrays["actual"][start:stop])
+
+    finals = [determine_final_prediction(pred, dict(zip(OUTCOMES, h))) for pred, h in zip(preds, hist)]
+    labels = [OUTCOME_LABELS.get(c, c) for c in model.classes_]
+    columns_of = [labels.index(o) if o in labels else -1 for o in OUTCOMES]
+    p_actual = np.array([proba[i, columns_of[a]] if columns_of[a] >= 0 else 0.0 for i, a in enumerate(actual)])
+    return {
+        "model_hit": np.array([OUTCOME_LABELS.get(p) == OUTCOMES[a] for p, a in zip(preds, actual)]),
+        "final_hit": np.array([hit(final, a) for final, a in zip(finals, actual)]),
+        "hedged": np.array([" or " in final for final in finals]),
+        "model_loss": -np.log(np.clip(p_actual, EPS, 1.0)),
+        "hist_loss": -np.log(np.clip(hist[np.arange(len(actual)), actual] / 100, EPS, 1.0)),
+    }
+
+def run_backtest(data, models, model_files=None, engine=None, workers=None, since=None):
+    prepared = prepare(data, models, since)
+    frames = []
+    with tempfile.TemporaryDirectory(prefix="backtest-") as workdir:
+        shards = []
+        for version, arrays in prepared.items():
+            scored = arrays["totals"] > 0
+            order = np.lexsort((arrays["season"][scored], arrays["league"][scored]))
+            for name in ("means", "hist", "actual"):
+                np.save(os.path.join(workdir, f"{version}.{name}.npy"), arrays[name][scored][order])
+            np.save(os.path.join(workdir, f"{version}.source_idx.npy"), arrays["source_idx"])
+            with open(os.path.join(workdir, f"{version}.columns.json"), "w") as f:
+                json.dump(arrays["columns"], f)
+
+            labels = pd.DataFrame({"league": arrays["league"], "season": arrays["season"], "scored": scored})
+            counts = labels.groupby(["league", "season"]).agg(matches=("scored", "size"), scored=("scored", "sum"))
+            frames.append(counts.assign(version=version))
+            keys = labels[scored].iloc[order]
+            bounds = np.flatnonzero((keys[["league", "season"]] != keys[["league", "season"]].shift()).any(axis=1))
+            bounds = np.append(bounds, len(keys))
+            shards += [(version, keys["league"].iat[a], keys["season"].iat[a], a, b)
+                       for a, b in zip(bounds[:-1], bounds[1:])]
+
+        if workers == 1:
+            _init_worker(model_files or {}, engine)
+            outputs = [score_shard(workdir, v, a, b) for v, _, _, a, b in shards]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(model_files or {}, engine)) as pool:
+                futures = [pool.submit(score_shard, workdir, v, a, b) for v, _, _, a, b in shards]
+                outputs = [f.result() for f in futures]
+
+    if not frames:
+        return pd.DataFrame()
+    report = pd.concat(frames).reset_index().set_index(["version", "league", "season"])
+    metrics = pd.DataFrame(
+        [{"version": v, "league": league, "season": season, **{k: float(out[k].mean()) for k in out}}
+         for (v, league, season, _, _), out in zip(shards, outputs)],
+        columns=["version", "league", "season", "model_hit", "final_hit", "hedged", "model_loss", "hist_loss"],
+    ).set_index(["version", "league", "season"])
+    report = report.join(metrics).rename(columns={
+        "model_hit": "model_accuracy", "final_hit": "final_accuracy", "hedged": "final_hedged",
+        "model_loss": "model_log_loss", "hist_loss": "hist_log_loss"})
+    report = report.reset_index().sort_values(["version", "league", "season"], ignore_index=True)
+
+    weights = report["scored"]
+    overall = {"version": "all", "league": "all", "season": "all",
+               "matches": int(report["matches"].sum()), "scored": int(weights.sum())}
+    for column in ("model_accuracy", "final_accuracy", "final_hedged", "model_log_loss", "hist_log_loss"):
+        overall[column] = float((report[column].fillna(0) * weights).sum() / max(weights.sum(), 1))
+    return pd.concat([report, pd.DataFrame([overall])], ignore_index=True)
+
+def spot_check(data, models, n=100, seed=0):
+    """Recompute n random matches with compute_mean_for_teams and
+    calculate_probabilities on only the rows before the match date and
+    compare with the vectorised prior features."""
+    prepared = prepare(data, models)
+    rng = random.Random(seed)
+    checked = 0
+    for version, arrays in prepared.items():
+        home_col, away_col, _ = get_column_names(version)
+        candidates = np.flatnonzero(arrays["totals"] > 0)
+        for i in rng.sample(list(candidates), min(n, len(candidates))):
+            row = data.iloc[arrays["positions"][i]]
+            before = data[data["Date"] < row["Date"]]
+            home, away = row[home_col], row[away_col]
+            expected = compute_mean_for_teams(home, away, before, models[version], get_column_names, version)
+            expected = expected[arrays["columns"]].to_numpy(dtype=np.float64)[0, arrays["source_idx"]]
+            if not np.allclose(expected, arrays["means"][i], rtol=1e-5, equal_nan=True):
+                raise AssertionError(f"Feature mismatch for {home} v {away} on {row['Date']:%Y-%m-%d}")
+            probs = calculate_probabilities(home, away, before, version)
+            if not np.allclose([probs[o] for o in OUTCOMES], arrays["hist"][i]):
+                raise AssertionError(f"Probability mismatch for {home} v {away} on {row['Date']:%Y-%m-%d}")
+            checked += 1
+    return checked
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Walk-forward backtest over the historical matches")
+    parser.add_argument("--model", action="append", default=[], metavar="VERSION=PATH",
+                        help="score this model file (.pkl or compiled .npz) instead of the bundled one")
+    parser.add_argument("--engine", choices=["sklearn", "compiled"], help="engine for bundled models")
+    parser.add_argument("--workers", type=int, help="processes (defaults to the CPU count; 1 runs inline)")
+    parser.add_argument("--since", help="only score matches on or after this date")
+    parser.add_argument("--check", type=int, default=0, help="recompute N random matches the slow way first")
+    parser.add_argument("-o", "--output", help="write the report here (.csv or .json)")
+    args = parser.parse_args(argv)
+
+    model_files = dict(spec.split("=", 1) for spec in args.model)
+    data = load_dataset()
+    models = {v: load_model_file(model_files[v]) if v in model_files else serving_model(v, args.engine)
+              for v in VERSIONS if get_column_names(v)[0] in data}
+    if args.check:
+        logging.info(f"Spot-checked {spot_check(data, models, args.check)} matches against the scan path")
+
+    report = run_backtest(data, models, model_files, args.engine, args.workers, args.since)
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(report.to_string(index=False, float_format=lambda x: f"{x:.4f}"), file=sys.stderr)
+    if args.output:
+        if args.output.endswith(".json"):
+            report.to_json(args.output, orient="records", indent=2)
+        else:
+            report.to_csv(args.output, index=False)
+
+if __name__ == "__main__":
+    main()
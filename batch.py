@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""batch.py
+
+Score a whole list of fixtures in one pass: features for every (home, away)
+pair are built with a single groupby over the matching rows and each model is
+called once per batch instead of once per fixture.
+
+    python batch.py fixtures.csv -o predictions.csv
+    python batch.py fixtures.csv --format json > predictions.json
+
+The input CSV needs league, home and away columns.
+"""
+
+import sys
+import argparse
+import logging
+import numpy as np
+import pandas as pd
+from analytics import get_column_names
+from data_loader import load_dataset
+from matchup_index import build_matchup_index, matchup_positions
+from metadata import build_metadata, canonical_name, league_version
+from feature_table import build_feature_table, pair_position
+from model_registry import serving_model
+from model_utils import determine_final_prediction
+
+OUTCOMES = ("Home Team Win", "Draw", "Away Team Win")
+OUTCOME_LABELS = {1: "Home Team Win", 2: "Draw", 3: "Away Team Win"}
+RESULT_CODES = {"H": "Home Team Win", "D": "Draw", "A": "Away Team Win"}
+
+def select_fixture_rows(pairs, data, version, index=None):
+    home_col, away_col, _ = get_column_names(version)
+    if index is not None:
+        rows = [matchup_positions(index, version, home, away) for home, away in pairs]
+        return data.take(np.sort(np.concatenate(rows)) if rows else np.empty(0, dtype=np.intp))
+    keys = pd.MultiIndex.from_arrays([data[home_col], data[away_col]])
+    return data[keys.isin(pairs)]
+
+def build_feature_matrix(pairs, data, model, version, index=None, feature_table=None):
+    home_col, away_col, result_col = get_column_names(version)
+    pairs = pd.MultiIndex.from_tuples(pairs, names=[home_col, away_col])
+    rows = select_fixture_rows(pairs, data, version, index)
+    group_keys = [rows[home_col], rows[away_col]]
+
+    if feature_table is not None:
+        positions = np.array([pair_position(feature_table, home, away, -1) for home, away in pairs], dtype=np.intp)
+        matrix = np.full((len(pairs), len(feature_table["columns"])), np.nan, dtype=np.float32)
+        matrix[positions >= 0] = feature_table["matrix"][positions[positions >= 0]]
+        features = pd.DataFrame(matrix, index=pairs, columns=feature_table["columns"])
+    else:
+        numeric = rows.drop(columns=[result_col], errors="ignore").select_dtypes("number")
+        means = numeric.groupby(group_keys, observed=True).mean()
+        features = means.reindex(pairs).reindex(columns=model.feature_names_in_, fill_value=0)
+
+    totals = rows.groupby(group_keys, observed=True).size().reindex(pairs, fill_value=0)
+    counts = rows.groupby(group_keys + [rows[result_col]], observed=True).size()
+    counts = counts.unstack(fill_value=0).reindex(index=pairs, columns=list(RESULT_CODES), fill_value=0)
+    probs = counts.div(totals.where(totals > 0), axis=0).mul(100).rename(columns=RESULT_CODES)
+    return features, probs, totals
+
+def predict_fixtures(fixtures, models, data, index=None, feature_tables=None):
+    fixtures = pd.DataFrame(fixtures, columns=["league", "home", "away"]).reset_index(drop=True)
+    metadata = index["metadata"] if index is not None else build_metadata(data, get_column_names)
+    # Aliases resolve once per fixture; results keep the names as given.
+    home, away = (fixtures[side].map(lambda name: canonical_name(metadata, name)) for side in ("home", "away"))
+    fixtures["version"] = fixtures["league"].map(lambda league: league_version(metadata, league))
+    results = fixtures.assign(matches=0, final_prediction=None, model_prediction=None,
+                              **{f"hist_{o}": np.nan for o in OUTCOMES},
+                              **{f"model_{o}": np.nan for o in OUTCOMES})
+
+    for version, group in fixtures.groupby("version"):
+        if get_column_names(version)[0] not in data:
+            logging.warning(f"No {version} matches loaded, skipping {len(group)} fixtures")
+            continue
+        model = models[version]
+        keys = list(zip(home[group.index], away[group.index]))
+        pairs = list(dict.fromkeys(keys))
+        feature_table = feature_tables.get(version) if feature_tables else None
+        features, probs, totals = build_feature_matrix(pairs, data, model, version, index, feature_table)
+        scored = totals[totals > 0].index
+        if len(scored) == 0:
+            continue
+
+        X = features.loc[scored]
+        preds = pd.Series(model.predict(X), index=scored)
+        proba = pd.DataFrame(model.predict_proba(X), index=scored,
+                             columns=[OUTCOME_LABELS.get(c, c) for c in model.classes_])
+
+        for row, key in zip(group.index, keys):
+            results.at[row, "matches"] = totals[key]
+            if totals[key] == 0:
+                continue
+            hist = probs.loc[key].to_dict()
+            results.at[row, "final_prediction"] = determine_final_prediction(preds[key], hist)
+            results.at[row, "model_prediction"] = OUTCOME_LABELS.get(preds[key], preds[key])
+            for outcome in OUTCOMES:
+                results.at[row, f"hist_{outcome}"] = hist[outcome]
+                results.at[row, f"model_{outcome}"] = proba.at[key, outcome]
+
+    unknown = results["version"].isna()
+    if unknown.any():
+        logging.warning(f"Skipping {unknown.sum()} fixtures from unknown leagues")
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Predict a batch of fixtures")
+    parser.add_argument("fixtures", help="CSV with league, home and away columns ('-' for stdin)")
+    parser.add_argument("-o", "--output", help="output file (defaults to stdout)")
+    parser.add_argument("--format", choices=["csv", "json"], help="output format (defaults to the output extension)")
+    parser.add_argument("--engine", choices=["sklearn", "compiled"], help="model engine (defaults to MODEL_ENGINE)")
+    args = parser.parse_args(argv)
+
+    fixtures = pd.read_csv(sys.stdin if args.fixtures == "-" else args.fixtures)
+    data = load_dataset()
+    index = build_matchup_index(data, get_column_names)
+    models = {v: serving_model(v, args.engine) for v in ("v1", "v2")}
+    feature_tables = {v: build_feature_table(data, m, get_column_names, v, index["metadata"])
+                      for v, m in models.items()}
+    results = predict_fixtures(fixtures[["league", "home", "away"]], models, data, index, feature_tables)
+
+    fmt = args.format or ("json" if args.output and args.output.endswith(".json") else "csv")
+    out = args.output or sys.stdout
+    if fmt == "json":
+        results.to_json(out, orient="records", indent=2)
+    else:
+        results.to_csv(out, index=False)
+
+if __name__ == "__main__":
+    main()
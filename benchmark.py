@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""benchmark.py
+
+Reproducible benchmark for the prediction request path and data loading.
+
+    python benchmark.py                        # 1x, 10x, 100x, scan + indexed
+    python benchmark.py --scales 1,10 --repeat 20 -o bench.json
+
+Each stage is timed over the same seeded sample of fixtures and reported as
+p50/p95/mean latency plus the peak Python allocation of one traced call.
+"scan" mode calls the functions on the raw frame the way the app originally
+did; "indexed" mode uses the matchup index, feature tables and form state
+built at load time; "compiled" is "indexed" with the models swapped for
+their tree_engine compilation. Datasets larger than the bundled CSV are synthesised by
+replaying it as further seasons (dates shifted past the end of the data), so
+pairs gain history the way they would with more seasons loaded.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import platform
+import argparse
+import resource
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+from analytics import (
+    calculate_probabilities,
+    get_column_names,
+    get_head_to_head_history,
+    get_team_recent_form,
+)
+from batch import predict_fixtures
+from controller import run_prediction
+from data_loader import load_dataset
+from feature_table import build_feature_table
+from form import build_form_state
+from matchup_index import build_matchup_index, matchup_positions
+from metadata import league_teams
+from model_registry import get_model
+from model_utils import compute_mean_for_teams
+from tree_engine import compile_model
+
+VERSIONS = ("v1", "v2")
+
+def summarize(samples):
+    ms = np.asarray(samples) * 1000
+    return {
+        "n": len(ms),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "mean_ms": float(ms.mean()),
+        "max_ms": float(ms.max()),
+    }
+
+def time_calls(fn, calls):
+    samples = []
+    for args in calls:
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def peak_alloc(fn, *args):
+    tracemalloc.start()
+    try:
+        fn(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def measure(fn, calls):
+    result = summarize(time_calls(fn, calls))
+    result["peak_alloc_bytes"] = peak_alloc(fn, *calls[0])
+    return result
+
+def scale_dataset(data, factor):
+    if factor == 1:
+        return data
+    span = data["Date"].max() - data["Date"].min() + pd.Timedelta(days=1)
+    copies = []
+    for k in range(factor):
+        copy = data.copy()
+        copy["Date"] = copy["Date"] + span * k
+        copies.append(copy)
+    scaled = pd.concat(copies, ignore_index=True)
+    scaled.attrs["data_version"] = f"{data.attrs.get('data_version')}x{factor}"
+    return scaled
+
+def sample_fixtures(index, n, seed):
+    fixtures = []
+    metadata = index["metadata"]
+    for league, entry in metadata["leagues"].items():
+        version, teams = entry["version"], league_teams(metadata, league)
+        fixtures += [(league, version, h, a) for h in teams for a in teams
+                     if h != a and len(matchup_positions(index, version, h, a))]
+    rng = random.Random(seed)
+    return rng.sample(fixtures, min(n, len(fixtures)))
+
+def build_state(data, models):
+    start = time.perf_counter()
+    index = build_matchup_index(data, get_column_names)
+    index_s = time.perf_counter() - start
+    start = time.perf_counter()
+    tables = {v: build_feature_table(data, m, get_column_names, v, index["metadata"]) for v, m in models.items()}
+    tables_s = time.perf_counter() - start
+    start = time.perf_counter()
+    form_state = build_form_state(data, get_column_names, metadata=index["metadata"])
+    form_s = time.perf_counter() - start
+    timings = {"matchup_index_s": index_s, "feature_tables_s": tables_s, "form_state_s": form_s}
+    return index, tables, form_state, timings
+
+def bench_request_path(data, models, fixtures, state, mode):
+    index, tables, form_state = state if mode != "scan" else (None, {}, None)
+    stages = {}
+    stages["calculate_probabilities"] = measure(
+        lambda h, a, v: calculate_probabilities(h, a, data, v, index=index),
+        [(h, a, v) for _, v, h, a in fixtures])
+    stages["compute_mean_for_teams"] = measure(
+        lambda h, a, v: compute_mean_for_teams(h, a, data, models[v], get_column_names, v,
+                                               index=index, feature_table=tables.get(v)),
+        [(h, a, v) for _, v, h, a in fixtures])
+    stages["get_team_recent_form"] = measure(
+        lambda t, v: get_team_recent_form(t, data, v, index=index, form_state=form_state),
+        [(h, v) for _, v, h, _ in fixtures])
+    stages["get_head_to_head_history"] = measure(
+        lambda h, a, v: get_head_to_head_history(h, a, data, v, index=index),
+        [(h, a, v) for _, v, h, a in fixtures])
+
+    inputs = [(v, compute_mean_for_teams(h, a, data, models[v], get_column_names, v,
+                                         index=index, feature_table=tables.get(v)))
+              for _, v, h, a in fixtures]
+    stages["model.predict"] = measure(lambda v, x: models[v].predict(x), inputs)
+    stages["model.predict_proba"] = measure(lambda v, x: models[v].predict_proba(x), inputs)
+    stages["run_prediction"] = measure(
+        lambda h, a, v: run_prediction(h, a, models[v], data, v, index=index,
+                                       feature_table=tables.get(v), form_state=form_state),
+        [(h, a, v) for _, v, h, a in fixtures])
+    return stages
+
+def bench_throughput(data, models, fixtures, state, mode):
+    index, tables, form_state = state if mode != "scan" else (None, None, None)
+    start = time.perf_counter()
+    for _, v, h, a in fixtures:
+        run_prediction(h, a, models[v], data, v, index=index,
+                       feature_table=tables.get(v) if tables else None, form_state=form_state)
+    single_s = time.perf_counter() - start
+
+    batch = [(league, h, a) for league, _, h, a in fixtures]
+    start = time.perf_counter()
+    predict_fixtures(batch, models, data, index=index, feature_tables=tables)
+    batch_s = time.perf_counter() - start
+    return {
+        "fixtures": len(fixtures),
+        "single_per_s": len(fixtures) / single_s,
+        "batch_per_s": len(fixtures) / batch_s,
+    }
+
+def bench_loading(data, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for version in VERSIONS:
+            home_col = get_column_names(version)[0]
+            if home_col not in data:
+                continue
+            rows = data[data[home_col].notna()].dropna(axis=1, how="all").drop(columns=["Version"])
+            rows = rows.assign(Date=rows["Date"].dt.strftime("%d/%m/%Y"))
+            path = os.path.join(tmp, f"football_{version}.csv")
+            rows.to_csv(path, index=False)
+            paths.append(path)
+        csv_bytes = sum(os.path.getsize(p) for p in paths)
+
+        cold, warm = [], []
+        for _ in range(repeat):
+            cache_dir = os.path.join(tmp, "cache")
+            start = time.perf_counter()
+            load_dataset(paths, cache_dir=cache_dir)
+            cold.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            load_dataset(paths, cache_dir=cache_dir)
+            warm.append(time.perf_counter() - start)
+            shutil.rmtree(cache_dir)
+        return {
+            "csv_bytes": csv_bytes,
+            "cold_csv": summarize(cold),
+            "warm_cache": summarize(warm),
+        }
+
+def run(scales, modes, repeat, load_repeat, seed):
+    base = load_dataset()
+    models = {v: get_model(v) for v in VERSIONS}
+    compiled = {v: compile_model(m) for v, m in models.items()} if "compiled" in modes else None
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "data_version": base.attrs.get("data_version"),
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "runs": [],
+    }
+    for factor in scales:
+        data = scale_dataset(base, factor)
+        index, tables, form_state, build_timings = build_state(data, models)
+        fixtures = sample_fixtures(index, repeat, seed)
+        run_result = {
+            "scale": factor,
+            "rows": len(data),
+            "memory_bytes": int(data.memory_usage(deep=True).sum()),
+            "build": build_timings,
+            "load": bench_loading(data, load_repeat) if load_repeat else None,
+            "modes": {},
+        }
+        for mode in modes:
+            logging.info(f"benchmark: scale {factor}x, {mode} mode, {len(fixtures)} fixtures")
+            mode_models = compiled if mode == "compiled" else models
+            run_result["modes"][mode] = {
+                "stages": bench_request_path(data, mode_models, fixtures, (index, tables, form_state), mode),
+                "throughput": bench_throughput(data, mode_models, fixtures, (index, tables, form_state), mode),
+            }
+        results["runs"].append(run_result)
+    results["meta"]["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return results
+
+def print_report(results, out=sys.stderr):
+    for run_result in results["runs"]:
+        print(f"\n== scale {run_result['scale']}x ({run_result['rows']} rows, "
+              f"{run_result['memory_bytes'] / 1e6:.1f} MB) ==", file=out)
+        if run_result["load"]:
+            load = run_result["load"]
+            print(f"  load_dataset cold {load['cold_csv']['p50_ms']:.1f} ms, "
+                  f"warm {load['warm_cache']['p50_ms']:.1f} ms", file=out)
+        for mode, mode_result in run_result["modes"].items():
+            print(f"  [{mode}]", file=out)
+            for stage, s in mode_result["stages"].items():
+                print(f"    {stage:<26} p50 {s['p50_ms']:9.3f} ms  p95 {s['p95_ms']:9.3f} ms  "
+                      f"peak {s['peak_alloc_bytes'] / 1e3:9.1f} kB", file=out)
+            t = mode_result["throughput"]
+            print(f"    throughput: single {t['single_per_s']:.1f}/s, batch {t['batch_per_s']:.1f}/s", file=out)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the prediction request path")
+    parser.add_argument("--scales", default="1,10,100", help="comma-separated dataset scale factors")
+    parser.add_argument("--modes", default="scan,indexed", help="comma-separated: scan, indexed, compiled")
+    parser.add_argument("--repeat", type=int, default=50, help="fixtures sampled per stage")
+    parser.add_argument("--load-repeat", type=int, default=3, help="load_dataset runs per scale (0 to skip)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="write JSON results here (defaults to stdout)")
+    args = parser.parse_args(argv)
+
+    results = run([int(s) for s in args.scales.split(",")], args.modes.split(","),
+                  args.repeat, args.load_repeat, args.seed)
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+
+if __name__ == "__main__":
+    main()
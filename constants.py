@@ -7,7 +7,6 @@ Original file is located at
     https://colab.research.google.com/drive/1G7NzPgDSNjr5CuhTUk54mkhNaUUulW7i
 """
 
-MODEL1_URL = "model1.pkl"
-MODEL2_URL = "model2.pkl"
-DATA1_URL =  "football_data1.csv"
-DATA2_URL =  "football_data2.csv"
\ No newline at end of file
+CACHE_DIR = ".cache"
+MANIFEST_FILE = "manifest.json"
+MODEL_FILES = {"v1": "model1.pkl", "v2": "model2.pkl"}
@@ -7,30 +7,46 @@ Original file is located at
     https://colab.research.google.com/drive/1DRHmqRRGvKAsXTRJfHMmDzFbPVNbe5Ke
 """
 
+import metrics
 from model_utils import (
     compute_mean_for_teams,
-    calculate_probabilities,
     determine_final_prediction,
     predict_with_confidence,
 )
 from analytics import (
+    calculate_probabilities,
     get_team_recent_form,
-    get_head_to_head_history
+    get_head_to_head_history,
+    get_column_names,
+    resolve_names
 )
 
-def run_prediction(home_team, away_team, model, data, version):
-    input_data = compute_mean_for_teams(home_team, away_team, data, model, version=version)
-    probs = calculate_probabilities(home_team, away_team, data, version=version)
-
-    if input_data is None or probs is None:
-        return None, None, None, None, None, None
-
-    pred = model.predict(input_data)[0]
-    final = determine_final_prediction(pred, probs)
-    pred_label, pred_conf, full_conf = predict_with_confidence(model, input_data)
-
-    home_form = get_team_recent_form(home_team, data, version=version)
-    away_form = get_team_recent_form(away_team, data, version=version)
-    head_to_head = get_head_to_head_history(home_team, away_team, data, version=version)
-
-    return final, full_conf, probs, home_form, away_form, head_to_head
\ No newline at end of file
+def run_prediction(home_team, away_team, model, data, version, index=None, feature_table=None,
+                   form_state=None):
+    with metrics.request("run_prediction", version=version):
+        # Aliases resolve once here; everything below sees the dataset's spelling.
+        home_team, away_team = resolve_names(index, home_team, away_team)
+        metrics.observe("dataset_rows", len(data))
+        input_data = compute_mean_for_teams(home_team, away_team, data, model, get_column_names,
+                                            version=version, index=index, feature_table=feature_table)
+        with metrics.stage("filtering"):
+            probs = calculate_probabilities(home_team, away_team, data, version=version, index=index)
+
+        if input_data is None or probs is None:
+            metrics.count("no_history")
+            return None, None, None, None, None, None
+
+        with metrics.stage("predict"):
+            pred = model.predict(input_data)[0]
+        final = determine_final_prediction(pred, probs)
+        with metrics.stage("predict_proba"):
+            pred_label, pred_conf, full_conf = predict_with_confidence(model, input_data)
+
+        with metrics.stage("form"):
+            home_form = get_team_recent_form(home_team, data, version=version, index=index, form_state=form_state)
+            away_form = get_team_recent_form(away_team, data, version=version, index=index, form_state=form_state)
+        with metrics.stage("h2h"):
+            head_to_head = get_head_to_head_history(home_team, away_team, data, version=version, index=index)
+        metrics.observe("h2h_rows", len(head_to_head))
+
+    return final, full_conf, probs, home_form, away_form, head_to_head
@@ -8,35 +8,232 @@ Original file is located at
 """
 
 import os
+import json
+import shutil
+import hashlib
+import numpy as np
 import pandas as pd
-import joblib
-import requests
 import logging
-from constants import MODEL1_URL, MODEL2_URL, DATA1_URL, DATA2_URL
+from constants import CACHE_DIR
+from fetch import ensure_artifacts, sha256_file
 
 logging.basicConfig(level=logging.INFO)
 
-def download_file_if_needed(url, filename):
-    if not os.path.exists(filename):
-        try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            with open(filename, "wb") as f:
-                f.write(response.content)
-            logging.info(f"Downloaded {filename}")
-        except requests.RequestException as e:
-            logging.error(f"Failed to download {url}: {e}")
+DATA_FILES = ("football_data1.csv", "football_data2.csv")
+CACHE_FORMAT = 2
+CHUNK_SIZE = 50_000
+# Columns the analytics need whatever the models use; see required_columns().
+ANALYTICS_COLUMNS = ("Div", "Country", "League", "Season", "Date", "Time", "HomeTeam", "AwayTeam", "FTR", "HTR",
+                     "Home", "Away", "Res", "FTHG", "FTAG", "HG", "AG")
+TEXT_COLUMNS = {"Div", "Country", "League", "Season", "Time", "HomeTeam", "AwayTeam", "FTR", "HTR",
+                "Home", "Away", "Res", "Referee"}
 
 def download_models():
-    download_file_if_needed(MODEL1_URL, "Models/model1.pkl")
-    download_file_if_needed(MODEL2_URL, "models/model2.pkl")
-    model1 = joblib.load("model1.pkl")
-    model2 = joblib.load("model2.pkl")
-    return model1, model2
-
-def load_data():
-    download_file_if_needed(DATA1_URL, "Datasets/football_data1.csv")
-    download_file_if_needed(DATA2_URL, "Datasets/football_data2.csv")
-    data1 = pd.read_csv("football_data1.csv")
-    data2 = pd.read_csv("football_data2.csv")
-    return data1, data2
\ No newline at end of file
+    from model_registry import get_model
+    return get_model("v1"), get_model("v2")
+
+def detect_version(df):
+    return "v2" if "Res" in df.columns else "v1"
+
+def parse_dates(values):
+    dates = pd.to_datetime(values, format="%d/%m/%Y", errors="coerce")
+    retry = dates.isna() & values.notna()
+    if retry.any():
+        dates[retry] = pd.to_datetime(values[retry], format="%d/%m/%y", errors="coerce")
+    return dates
+
+def required_columns(feature_names=()):
+    return list(dict.fromkeys([*ANALYTICS_COLUMNS, *feature_names]))
+
+def count_rows(path):
+    lines, last = 0, b"\n"
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    return max(lines - 1 + (last != b"\n"), 0)
+
+def _new_column(kind, capacity):
+    if kind == "category":
+        return {"kind": kind, "values": np.full(capacity, -1, dtype=np.int32), "codes": {}}
+    if kind == "datetime":
+        return {"kind": kind, "values": np.full(capacity, np.datetime64("NaT"), dtype="datetime64[ns]")}
+    return {"kind": kind, "values": np.full(capacity, np.nan, dtype=np.float32)}
+
+def _grow(values, capacity, fill):
+    return np.concatenate([values, np.full(capacity - len(values), fill, dtype=values.dtype)])
+
+def _column_kind(name, sample):
+    if name == "Date":
+        return "datetime"
+    if name in TEXT_COLUMNS or not pd.api.types.is_numeric_dtype(sample):
+        return "category"
+    return "numeric"
+
+def _write_chunk(column, start, values):
+    stop = start + len(values)
+    if column["kind"] == "category":
+        chunk = pd.Categorical(values)
+        codes = column["codes"]
+        mapping = np.array([codes.setdefault(c, len(codes)) for c in chunk.categories], dtype=np.int32)
+        column["values"][start:stop] = np.where(chunk.codes >= 0, mapping[chunk.codes] if len(mapping) else -1, -1)
+    elif column["kind"] == "datetime":
+        column["values"][start:stop] = parse_dates(values).to_numpy(dtype="datetime64[ns]")
+    else:
+        column["values"][start:stop] = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float32, na_value=np.nan)
+
+def _finish_column(column, rows):
+    values = column["values"][:rows]
+    if column["kind"] != "category":
+        return values
+    categories = np.array(sorted(column["codes"], key=str), dtype=object)
+    remap = np.empty(len(categories), dtype=np.int32)
+    remap[[column["codes"][c] for c in categories]] = np.arange(len(categories), dtype=np.int32)
+    codes = np.where(values >= 0, remap[values] if len(remap) else -1, -1)
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+def ingest_csv(paths, columns=None, chunksize=CHUNK_SIZE):
+    """Stream the CSVs chunk by chunk into one preallocated column store.
+
+    Only `columns` (all columns when None) are read; numbers are stored as
+    float32, text as categorical codes and Date as datetime64, so the combined
+    frame is built without holding a full object-typed copy of any file or
+    concatenating per-file frames.
+    """
+    sources = []
+    for path in paths:
+        if not os.path.exists(path):
+            logging.error(f"Dataset {path} not found, skipping")
+            continue
+        sample = pd.read_csv(path, nrows=1000)
+        usecols = [c for c in sample.columns if columns is None or c in columns]
+        sources.append((path, detect_version(sample), usecols, sample))
+
+    capacity = sum(count_rows(path) for path, *_ in sources)
+    store = {}
+    for _, _, usecols, sample in sources:
+        for name in usecols:
+            if name not in store:
+                store[name] = _new_column(_column_kind(name, sample[name]), capacity)
+    versions = np.full(capacity, -1, dtype=np.int8)
+
+    rows = 0
+    for path, version, usecols, _ in sources:
+        for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunksize, dtype={c: str for c in TEXT_COLUMNS}):
+            if rows + len(chunk) > capacity:
+                # count_rows() was off (e.g. quoted newlines): grow instead of failing.
+                capacity = max(capacity * 2, rows + len(chunk))
+                for column in store.values():
+                    column["values"] = _grow(column["values"], capacity, _new_column(column["kind"], 1)["values"][0])
+                versions = _grow(versions, capacity, -1)
+            for name in usecols:
+                _write_chunk(store[name], rows, chunk[name])
+            versions[rows:rows + len(chunk)] = 0 if version == "v1" else 1
+            rows += len(chunk)
+
+    frame = {name: _finish_column(column, rows) for name, column in store.items()}
+    frame["Version"] = pd.Categorical.from_codes(versions[:rows], categories=["v1", "v2"])
+    return pd.DataFrame(frame, copy=False)
+
+def file_fingerprint(path, with_hash=True):
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    fingerprint = {"path": path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if with_hash:
+        fingerprint["sha256"] = sha256_file(path)
+    return fingerprint
+
+def sources_version(sources):
+    digest = hashlib.sha256()
+    for source in sources:
+        digest.update((source["sha256"] if source else "-").encode())
+    return digest.hexdigest()[:16]
+
+def sources_match(sources, paths):
+    if [s and s["path"] for s in sources] != [p if os.path.exists(p) else None for p in paths]:
+        return False
+    for source, path in zip(sources, paths):
+        if source is None:
+            continue
+        current = file_fingerprint(path, with_hash=False)
+        if (current["size"], current["mtime_ns"]) == (source["size"], source["mtime_ns"]):
+            continue
+        # Touched but possibly unchanged (e.g. re-downloaded): fall back to the hash.
+        current = file_fingerprint(path)
+        if current["sha256"] != source["sha256"]:
+            return False
+        source.update(current)
+    return True
+
+def write_dataset_cache(df, cache_path, sources):
+    tmp_path = f"{cache_path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    columns = []
+    for i, col in enumerate(df.columns):
+        series = df[col]
+        entry = {"name": col, "file": f"{i}.npy"}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            entry["kind"] = "category"
+            entry["categories"] = series.cat.categories.tolist()
+            values = series.cat.codes.to_numpy()
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            entry["kind"] = "datetime"
+            entry["unit"] = np.datetime_data(series.dtype)[0]
+            values = series.to_numpy().view("int64")
+        else:
+            entry["kind"] = "numeric"
+            values = series.to_numpy()
+        np.save(os.path.join(tmp_path, entry["file"]), values)
+        columns.append(entry)
+    meta = {"format": CACHE_FORMAT, "rows": len(df), "sources": sources, "columns": columns}
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    shutil.rmtree(cache_path, ignore_errors=True)
+    os.replace(tmp_path, cache_path)
+
+def read_dataset_cache(cache_path, mmap_mode="r"):
+    with open(os.path.join(cache_path, "meta.json")) as f:
+        meta = json.load(f)
+    columns = {}
+    for entry in meta["columns"]:
+        values = np.load(os.path.join(cache_path, entry["file"]), mmap_mode=mmap_mode)
+        if entry["kind"] == "category":
+            columns[entry["name"]] = pd.Categorical.from_codes(values, categories=entry["categories"])
+        elif entry["kind"] == "datetime":
+            columns[entry["name"]] = values.view(f"datetime64[{entry['unit']}]")
+        else:
+            columns[entry["name"]] = values
+    return pd.DataFrame(columns, copy=False), meta
+
+def load_dataset(paths=DATA_FILES, cache_dir=CACHE_DIR, columns=None, chunksize=CHUNK_SIZE):
+    cache_name = "dataset"
+    if columns is not None:
+        columns = sorted(set(columns))
+        cache_name += "-" + hashlib.sha256("\0".join(columns).encode()).hexdigest()[:12]
+    cache_path = os.path.join(cache_dir, cache_name)
+    meta_path = os.path.join(cache_path, "meta.json")
+    if os.path.exists(meta_path):
+        try:
+            df, meta = read_dataset_cache(cache_path)
+            sources = json.loads(json.dumps(meta["sources"]))
+            if meta["format"] == CACHE_FORMAT and sources_match(sources, paths):
+                if sources != meta["sources"]:
+                    with open(meta_path, "w") as f:
+                        json.dump(meta | {"sources": sources}, f)
+                df.attrs["data_version"] = sources_version(sources)
+                return df
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Ignoring unreadable dataset cache {cache_path}: {e}")
+
+    ensure_artifacts(paths)
+    df = ingest_csv(paths, columns, chunksize)
+    sources = [file_fingerprint(p) for p in paths]
+    df.attrs["data_version"] = sources_version(sources)
+    try:
+        write_dataset_cache(df, cache_path, sources)
+        logging.info(f"Wrote dataset cache {cache_path} ({len(df)} rows)")
+    except OSError as e:
+        logging.warning(f"Could not write dataset cache {cache_path}: {e}")
+    return df
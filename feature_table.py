@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""feature_table.py
+
+Per-(home, away) head-to-head feature means, aligned to a model's
+feature_names_in_ and stored as one dense float32 matrix, so building the
+model input for a fixture is a row lookup.
+
+Running sums and non-missing counts are kept next to the matrix so new match
+rows can be folded in without another pass over the whole dataset. Rows are
+keyed by the (home, away) pair of metadata team IDs; lookups take IDs or
+names.
+"""
+
+import numpy as np
+import pandas as pd
+from metadata import build_metadata, resolve_team
+
+def source_columns(data, columns):
+    return [c for c in columns if c in data and pd.api.types.is_numeric_dtype(data[c])]
+
+def _pair_totals(rows, home_col, away_col, sources):
+    grouped = rows.groupby([home_col, away_col], observed=True, sort=False)[sources]
+    return grouped.sum(), grouped.count()
+
+def _refresh_means(table, positions):
+    sums = table["sums"][positions]
+    counts = table["counts"][positions]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, sums / counts, np.nan)
+    table["matrix"][np.ix_(positions, table["source_idx"])] = means
+
+def _team(table, team):
+    team_id = resolve_team(table["metadata"], team)
+    return team if team_id is None else team_id
+
+def build_feature_table(data, model, get_column_names, version="v1", metadata=None):
+    home_col, away_col, _ = get_column_names(version)
+    columns = list(model.feature_names_in_)
+    sources = source_columns(data, columns)
+    table = {
+        "version": version,
+        "metadata": build_metadata(data, get_column_names) if metadata is None else metadata,
+        "columns": columns,
+        "sources": sources,
+        "source_idx": np.array([columns.index(c) for c in sources], dtype=np.intp),
+        "keys": {},
+        "sums": np.zeros((0, len(sources))),
+        "counts": np.zeros((0, len(sources)), dtype=np.int64),
+        "matrix": np.zeros((0, len(columns)), dtype=np.float32),
+    }
+    if home_col in data and away_col in data:
+        update_feature_table(table, data, get_column_names)
+    return table
+
+def update_feature_table(table, rows, get_column_names):
+    home_col, away_col, _ = get_column_names(table["version"])
+    if home_col not in rows or away_col not in rows:
+        return table
+    sources = table["sources"]
+    rows = rows.reindex(columns=[home_col, away_col] + sources)
+    sums, counts = _pair_totals(rows, home_col, away_col, sources)
+    if sums.empty:
+        return table
+
+    keys = table["keys"]
+    pairs = [(_team(table, home), _team(table, away)) for home, away in sums.index]
+    new_pairs = list(dict.fromkeys(pair for pair in pairs if pair not in keys))
+    if new_pairs:
+        start = len(keys)
+        keys.update((pair, start + i) for i, pair in enumerate(new_pairs))
+        n = len(new_pairs)
+        table["sums"] = np.vstack([table["sums"], np.zeros((n, len(sources)))])
+        table["counts"] = np.vstack([table["counts"], np.zeros((n, len(sources)), dtype=np.int64)])
+        table["matrix"] = np.vstack([table["matrix"], np.zeros((n, len(table["columns"])), dtype=np.float32)])
+
+    positions = np.array([keys[pair] for pair in pairs], dtype=np.intp)
+    np.add.at(table["sums"], positions, sums.to_numpy(dtype=np.float64, na_value=0.0))
+    np.add.at(table["counts"], positions, counts.to_numpy(dtype=np.int64))
+    _refresh_means(table, positions)
+    return table
+
+def pair_position(table, home, away, default=None):
+    """The matrix row of a (home, away) pair, or `default`."""
+    return table["keys"].get((_team(table, home), _team(table, away)), default)
+
+def feature_row(table, home, away):
+    position = pair_position(table, home, away)
+    if position is None:
+        return None
+    return table["matrix"][position]
+
+def feature_frame(table, home, away):
+    row = feature_row(table, home, away)
+    if row is None:
+        return None
+    return pd.DataFrame(row[np.newaxis, :], columns=table["columns"])
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""fetch.py
+
+Fetch the data and model files listed in manifest.json, so a fresh checkout
+or container can boot without them in the image.
+
+    python fetch.py                            # fetch what is missing or fails its checksum
+    python fetch.py --mirror /mnt/artifacts    # from a local directory (or file:// URL), offline
+    python fetch.py --update                   # rewrite sizes, hashes and features from the local files
+
+Each manifest entry has a path (where the app reads the file), its size and
+sha256, and a source: an absolute http(s):// or file:// URL, or a name
+resolved against the mirror (--mirror or FETCH_MIRROR: a directory, a
+file:// URL or an http(s) base URL). Files whose size and hash already match
+are skipped. The rest are fetched concurrently, each streamed into a
+temporary file next to its destination while being hashed, checked, and then
+moved into place with os.replace, so a reader never sees a half-written file.
+An entry without a sha256 is fetched but not verified, and one marked
+"optional" (football_data1.csv, which not every deployment has) only logs a
+warning when it cannot be fetched. Model (.pkl) entries also list the
+model's feature_names_in_, so the app can work out which dataset columns to
+load without unpickling the models.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urljoin, urlparse
+from urllib.request import url2pathname
+from constants import MANIFEST_FILE
+
+FETCH_MIRROR = os.environ.get("FETCH_MIRROR") or None
+FETCH_WORKERS = int(os.environ.get("FETCH_WORKERS", "4"))
+FETCH_TIMEOUT = 30
+BLOCK_SIZE = 1 << 20
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest(path=MANIFEST_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)["artifacts"]
+    except FileNotFoundError:
+        logging.warning(f"No artifact manifest at {path}")
+        return []
+
+def is_current(entry):
+    """True when the file exists with the manifest's size and hash (a size
+    mismatch is decided without reading the file)."""
+    path = entry["path"]
+    if not os.path.exists(path):
+        return False
+    if entry.get("size") is not None and os.path.getsize(path) != entry["size"]:
+        return False
+    return entry.get("sha256") is None or sha256_file(path) == entry["sha256"]
+
+def resolve_source(entry, mirror=FETCH_MIRROR):
+    source = entry.get("source") or os.path.basename(entry["path"])
+    if urlparse(source).scheme in ("http", "https", "file") or os.path.isabs(source):
+        return source
+    if mirror is None:
+        raise ValueError(f"{entry['path']}: source {source!r} is relative and no mirror is configured")
+    if urlparse(mirror).scheme in ("http", "https", "file"):
+        return urljoin(mirror.rstrip("/") + "/", source)
+    return os.path.join(mirror, source)
+
+def _open_source(source):
+    scheme = urlparse(source).scheme
+    if scheme in ("http", "https"):
+        import requests
+        response = requests.get(source, stream=True, timeout=FETCH_TIMEOUT)
+        response.raise_for_status()
+        response.raw.decode_content = True
+        return response.raw
+    if scheme == "file":
+        source = url2pathname(unquote(urlparse(source).path))
+    return open(source, "rb")
+
+def fetch_one(entry, mirror=FETCH_MIRROR):
+    path = entry["path"]
+    source = resolve_source(entry, mirror)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.part-{os.getpid()}"
+    digest, size = hashlib.sha256(), 0
+    try:
+        with _open_source(source) as src, open(tmp, "wb") as dst:
+            for block in iter(lambda: src.read(BLOCK_SIZE), b""):
+                digest.update(block)
+                dst.write(block)
+                size += len(block)
+        if entry.get("size") is not None and size != entry["size"]:
+            raise ValueError(f"{source}: got {size} bytes, expected {entry['size']}")
+        if entry.get("sha256") is not None and digest.hexdigest() != entry["sha256"]:
+            raise ValueError(f"{source}: sha256 {digest.hexdigest()} does not match the manifest")
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    logging.info(f"Fetched {path} from {source} ({size} bytes)")
+    return path
+
+def fetch_all(entries, mirror=FETCH_MIRROR, workers=FETCH_WORKERS, verify=True):
+    """Fetch the entries that are missing (or, with verify, fail their
+    checksum). Returns {path: "ok" | "fetched" | "skipped" | "failed"}."""
+    status = {}
+    todo = []
+    for entry in entries:
+        current = is_current(entry) if verify else os.path.exists(entry["path"])
+        status[entry["path"]] = "ok" if current else "failed"
+        if not current:
+            todo.append(entry)
+
+    def run(entry):
+        try:
+            fetch_one(entry, mirror)
+            return "fetched"
+        except (OSError, ValueError) as e:
+            if entry.get("optional"):
+                logging.warning(f"Skipping optional {entry['path']}: {e}")
+                return "skipped"
+            logging.error(f"Could not fetch {entry['path']}: {e}")
+            return "failed"
+
+    if todo:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(todo))), thread_name_prefix="fetch") as pool:
+            for entry, result in zip(todo, pool.map(run, todo)):
+                status[entry["path"]] = result
+    return status
+
+def ensure_artifacts(paths, manifest=MANIFEST_FILE, mirror=FETCH_MIRROR):
+    """Fetch whichever of `paths` do not exist yet. Existing files are not
+    re-hashed here (this runs on every load); `python fetch.py` does that."""
+    missing = [p for p in paths if not os.path.exists(p)]
+    if not missing:
+        return {}
+    entries = {e["path"]: e for e in load_manifest(manifest)}
+    for path in missing:
+        if path not in entries:
+            logging.error(f"{path} is missing and not in {manifest}")
+    return fetch_all([entries[p] for p in missing if p in entries], mirror, verify=False)
+
+def model_features(path):
+    import joblib
+    return [str(f) for f in getattr(joblib.load(path), "feature_names_in_", [])]
+
+def manifest_features(path, manifest=MANIFEST_FILE):
+    """The feature names the manifest lists for a model file, or None when
+    it lists none or the file on disk is not the one it describes."""
+    entry = next((e for e in load_manifest(manifest) if e["path"] == path), None)
+    if entry is None or entry.get("features") is None or not is_current(entry):
+        return None
+    return entry["features"]
+
+def update_manifest(path=MANIFEST_FILE, paths=None):
+    """Refresh size and sha256 of every entry (or of those for `paths`) from
+    the files on disk, and the feature names of the models whose file
+    changed."""
+    entries = load_manifest(path)
+    for entry in entries:
+        if (paths is None or entry["path"] in paths) and os.path.exists(entry["path"]):
+            digest = sha256_file(entry["path"])
+            if entry["path"].endswith(".pkl") and (digest != entry.get("sha256") or "features" not in entry):
+                entry["features"] = model_features(entry["path"])
+            entry["size"] = os.path.getsize(entry["path"])
+            entry["sha256"] = digest
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"artifacts": entries}, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, path)
+    return entries
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch the data and model files in the manifest")
+    parser.add_argument("--manifest", default=MANIFEST_FILE)
+    parser.add_argument("--mirror", default=FETCH_MIRROR, help="directory, file:// or http(s):// base for relative sources")
+    parser.add_argument("--workers", type=int, default=FETCH_WORKERS)
+    parser.add_argument("--update", action="store_true", help="rewrite sizes and hashes from the local files")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.update:
+        for entry in update_manifest(args.manifest):
+            logging.info(f"{entry['path']}: {entry.get('size')} bytes, sha256 {entry.get('sha256')}"
+                         + (f", {len(entry['features'])} features" if "features" in entry else ""))
+        return 0
+    status = fetch_all(load_manifest(args.manifest), args.mirror, args.workers)
+    for path, result in status.items():
+        logging.info(f"{path}: {result}")
+    return 1 if "failed" in status.values() else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""form.py
+
+Rolling team form kept in fixed-size ring buffers: the last N outcomes per
+team, per head-to-head pair and per team at home / away. Built with one
+chronological pass over the data; record_result() appends a newer match in
+O(1) and the form queries return strings without touching the dataset.
+
+Buffers are keyed by metadata team ID; every function takes a team as an ID
+or as a name or alias. A name the metadata does not know is kept as its own
+key.
+"""
+
+from collections import defaultdict, deque
+from functools import partial
+import pandas as pd
+from metadata import build_metadata, resolve_team
+
+FORM_SIZE = 5
+
+def match_outcome(result, is_home):
+    if result == "D":
+        return "D"
+    if (result == "H" and is_home) or (result == "A" and not is_home):
+        return "W"
+    return "L"
+
+def _pair_key(version, home, away):
+    # IDs sort before names the metadata did not know.
+    if (isinstance(home, str), home) <= (isinstance(away, str), away):
+        return (version, home, away)
+    return (version, away, home)
+
+def new_form_state(size=FORM_SIZE, metadata=None):
+    buffer = partial(deque, maxlen=size)
+    return {
+        "size": size,
+        "metadata": metadata,
+        "teams": defaultdict(buffer),
+        "pairs": defaultdict(buffer),
+        "home": defaultdict(buffer),
+        "away": defaultdict(buffer),
+    }
+
+def _team(state, team):
+    team_id = resolve_team(state["metadata"], team)
+    return team if team_id is None else team_id
+
+def record_result(state, version, home, away, result):
+    home, away = _team(state, home), _team(state, away)
+    _record(state, version, home, away, result)
+
+def _record(state, version, home, away, result):
+    state["teams"][(version, home)].append(match_outcome(result, True))
+    state["teams"][(version, away)].append(match_outcome(result, False))
+    key = _pair_key(version, home, away)
+    state["pairs"][key].append((match_outcome(result, key[1] == home), match_outcome(result, key[1] != home)))
+    state["home"][(version, home)].append(result if isinstance(result, str) else "-")
+    state["away"][(version, away)].append(result if isinstance(result, str) else "-")
+
+def build_form_state(data, get_column_names, versions=("v1", "v2"), size=FORM_SIZE, metadata=None):
+    metadata = build_metadata(data, get_column_names) if metadata is None else metadata
+    state = new_form_state(size, metadata)
+    if "Date" not in data:
+        return state
+    for version in versions:
+        home_col, away_col, result_col = get_column_names(version)
+        if home_col not in data or away_col not in data:
+            continue
+        df = data[[home_col, away_col, result_col, "Date"]]
+        if not pd.api.types.is_datetime64_any_dtype(df["Date"]):
+            df = df.assign(Date=pd.to_datetime(df["Date"], dayfirst=True, errors="coerce"))
+        df = df.dropna(subset=["Date", home_col, away_col]).sort_values("Date", kind="stable")
+        results = df[result_col].astype(object).to_numpy()
+        home = df[home_col].astype(object).map(metadata["team_ids"]).to_numpy()
+        away = df[away_col].astype(object).map(metadata["team_ids"]).to_numpy()
+        for home_id, away_id, result in zip(home.tolist(), away.tolist(), results):
+            _record(state, version, home_id, away_id, result)
+    return state
+
+def _recent(buffer):
+    return "".join(reversed(buffer)) if buffer else ""
+
+def team_form(state, version, team):
+    return _recent(state["teams"].get((version, _team(state, team))))
+
+def head_to_head_form(state, version, home, away):
+    home, away = _team(state, home), _team(state, away)
+    key = _pair_key(version, home, away)
+    buffer = state["pairs"].get(key) or ()
+    first = "".join(o[0] for o in reversed(buffer))
+    second = "".join(o[1] for o in reversed(buffer))
+    return (first, second) if key[1] == home else (second, first)
+
+def home_away_form(state, version, home, away):
+    return (_recent(state["home"].get((version, _team(state, home)))),
+            _recent(state["away"].get((version, _team(state, away)))))
@@ -11,25 +11,30 @@ Original file is located at
 
 # main.py
 
-import streamlit as st
-import pandas as pd
-from data_loader import download_models, load_data
-from analytics import (
-    calculate_probabilities,
-    get_team_recent_form,
-    get_head_to_head_history,
-    get_column_names
-)
-from model_utils import (
-    compute_mean_for_teams,
-    determine_final_prediction
-)
-from leagues import leagues
-from views import (
-    render_historical_probabilities,
-    render_recent_form,
-    render_head_to_head_history
-)
+from startup import timed_phase, log_startup_report
+
+with timed_phase("imports"):
+    import streamlit as st
+    import metrics
+    from analytics import (
+        calculate_probabilities,
+        get_team_recent_form,
+        get_head_to_head_history,
+        get_column_names
+    )
+    from metadata import league_teams, league_version
+    from model_utils import (
+        compute_mean_for_teams,
+        determine_final_prediction
+    )
+    from model_registry import warm_up
+    from precompute import lookup
+    from store import Store
+    from views import (
+        render_historical_probabilities,
+        render_recent_form,
+        render_head_to_head_history
+    )
 
 # Load CSS and configure app first
 with open("style.css") as f:
@@ -38,54 +43,83 @@ with open("style.css") as f:
 st.set_page_config(page_title="Football Predictor", layout="centered")
 st.markdown('<div class="title">FOOTBALL PREDICTION APP</div>', unsafe_allow_html=True)
 
-# Initialize app silently
+# Initialize app silently; models are loaded on first use (and warmed up in
+# the background), so the page is usable as soon as the data is in. The store
+# is shared by all sessions and swaps in new data/model files as they land;
+# each run works on the snapshot it started with.
 @st.cache_resource(show_spinner=False)
-def load_app_data():
+def load_store():
+    store = Store()
     with st.spinner(""):
-        models = download_models()
-        data1, data2 = load_data()
-        return models, pd.concat([data1, data2], ignore_index=True)
+        snapshot = store.snapshot()
+        if snapshot["predictions"] is None:
+            warm_up()
+        log_startup_report()
+    store.start()
+    return store
 
-model1, model2, full_data = None, None, None
 with st.spinner("Loading football data..."):
-    models, full_data = load_app_data()
-    model1, model2 = models
+    store = load_store()
+    snapshot = store.snapshot()
+full_data, index, form_state, predictions = (snapshot["data"], snapshot["index"], snapshot["form_state"],
+                                             snapshot["predictions"])
+metadata = snapshot["metadata"]
 
 # Main app interface
-category = st.selectbox("Select Category", list(leagues.keys()))
-league = st.selectbox("Select a League", list(leagues[category].keys()))
-teams = leagues[category][league]
+# Leagues and teams come from the data (see metadata.py), seeded by leagues.py.
+category = st.selectbox("Select Category", list(metadata["categories"]))
+league = st.selectbox("Select a League", metadata["categories"][category])
+teams = league_teams(metadata, league)
 home_team = st.selectbox("Select Home Team", teams)
 away_team = st.selectbox("Select Away Team", [t for t in teams if t != home_team])
 
 if st.button("Predict Match Outcome"):
-    with st.spinner("Analyzing match..."):
-        version = "v2" if category == "Others" else "v1"
-        probs = calculate_probabilities(home_team, away_team, full_data, version)
-        input_data = compute_mean_for_teams(
-            home_team, away_team, full_data,
-            model2 if version == "v2" else model1,
-            get_column_names, version
-        )
+    version = league_version(metadata, league)
+    with st.spinner("Analyzing match..."), metrics.request("streamlit.predict", version=version):
+        metrics.observe("dataset_rows", len(full_data))
+        precomputed = lookup(predictions, version, home_team, away_team)
+        metrics.count("prediction_table_hit" if precomputed is not None else "prediction_table_miss")
+        if precomputed is not None:
+            final = precomputed.get("final")
+            probs = precomputed.get("probabilities")
+            home_form, away_form = precomputed.get("home_form"), precomputed.get("away_form")
+        else:
+            with metrics.stage("model_load"):
+                model, feature_table = store.model(snapshot, version), store.feature_table(snapshot, version)
+            with metrics.stage("filtering"):
+                probs = calculate_probabilities(home_team, away_team, full_data, version, index=index)
+            input_data = compute_mean_for_teams(
+                home_team, away_team, full_data, model,
+                get_column_names, version, index=index, feature_table=feature_table
+            )
+            if input_data is None or probs is None:
+                final = None
+            else:
+                with metrics.stage("predict"):
+                    pred = model.predict(input_data)[0]
+                final = determine_final_prediction(pred, probs)
+                with metrics.stage("form"):
+                    home_form = get_team_recent_form(home_team, full_data, version, index=index, form_state=form_state)
+                    away_form = get_team_recent_form(away_team, full_data, version, index=index, form_state=form_state)
 
-        if input_data is None or probs is None:
+        if final is None:
+            metrics.count("no_history")
             st.warning("No historical data available for this matchup.")
         else:
-            model = model2 if version == "v2" else model1
-            pred = model.predict(input_data)[0]
-            final = determine_final_prediction(pred, probs)
-            home_form = get_team_recent_form(home_team, full_data, version)
-            away_form = get_team_recent_form(away_team, full_data, version)
-            h2h = get_head_to_head_history(home_team, away_team, full_data, version)
+            with metrics.stage("h2h"):
+                h2h = get_head_to_head_history(home_team, away_team, full_data, version, index=index)
+            metrics.observe("h2h_rows", len(h2h))
 
-            st.markdown(f'<div class="prediction-result">🏆 Final Prediction: {final}</div>', 
-                       unsafe_allow_html=True)
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                render_historical_probabilities(probs)
-            with col2:
-                render_recent_form(home_team, away_team, home_form, away_form)
-            
-            if not h2h.empty:
-                render_head_to_head_history(h2h, home_team, away_team)
\ No newline at end of file
+            with metrics.stage("render"):
+                view_key = (version, home_team, away_team, snapshot["version"])
+                st.markdown(f'<div class="prediction-result">🏆 Final Prediction: {final}</div>', 
+                           unsafe_allow_html=True)
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    render_historical_probabilities(probs, key=view_key)
+                with col2:
+                    render_recent_form(home_team, away_team, home_form, away_form)
+                
+                if not h2h.empty:
+                    render_head_to_head_history(h2h, home_team, away_team, key=view_key)
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""matchup_index.py
+
+Row-position index over the combined match frame, built once at load time so
+per-request lookups cost O(matches for the pair) instead of a full-table scan.
+"""
+
+import numpy as np
+from metadata import build_metadata, resolve_team
+
+VERSIONS = ("v1", "v2")
+_NO_ROWS = np.empty(0, dtype=np.intp)
+
+def build_matchup_index(data, get_column_names, versions=VERSIONS, metadata=None):
+    metadata = build_metadata(data, get_column_names) if metadata is None else metadata
+    ids = metadata["team_ids"]
+    pairs, teams = {}, {}
+    for version in versions:
+        home_col, away_col, _ = get_column_names(version)
+        if home_col not in data or away_col not in data:
+            continue
+        for (home, away), rows in data.groupby([home_col, away_col], sort=False, observed=True).indices.items():
+            pairs[(version, ids[home], ids[away])] = rows
+        home_rows = data.groupby(home_col, sort=False, observed=True).indices
+        away_rows = data.groupby(away_col, sort=False, observed=True).indices
+        for team in home_rows.keys() | away_rows.keys():
+            rows = np.concatenate([home_rows.get(team, _NO_ROWS), away_rows.get(team, _NO_ROWS)])
+            teams[(version, ids[team])] = np.sort(rows)
+    return {"metadata": metadata, "pairs": pairs, "teams": teams}
+
+def matchup_positions(index, version, home, away):
+    metadata = index["metadata"]
+    return index["pairs"].get((version, resolve_team(metadata, home), resolve_team(metadata, away)), _NO_ROWS)
+
+def team_positions(index, version, team):
+    return index["teams"].get((version, resolve_team(index["metadata"], team)), _NO_ROWS)
+
+def select_matchup(home, away, data, get_column_names, version="v1", index=None):
+    if index is not None:
+        return data.take(matchup_positions(index, version, home, away))
+    home_col, away_col, _ = get_column_names(version)
+    return data[(data[home_col] == home) & (data[away_col] == away)]
+
+def select_team(team, data, get_column_names, version="v1", index=None):
+    if index is not None:
+        return data.take(team_positions(index, version, team))
+    home_col, away_col, _ = get_column_names(version)
+    return data[(data[home_col] == team) | (data[away_col] == team)]
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""metadata.py
+
+Team and league metadata built from the datasets plus leagues.py, once per
+dataset load:
+
+- every team name in either schema of the data gets an integer ID, and only
+  those do, so every ID has rows behind it;
+- names resolve to IDs through exact match first, then through a normalised
+  form (case, accents and punctuation folded) and the ALIASES table, so
+  "Manchester United", "man utd" and "Man United" are the same team;
+- each league in leagues.py has its names resolved that way and is matched
+  to the data league (Country/League, or Div in the v1 files) that shares
+  most of its teams, which gives its schema version, its seasons and the
+  teams in each season (from the Season column, or from the date where a
+  row has none, as in the v1 files). Listed names that resolve to no team in the data
+  are logged and left out, so a spelling difference cannot show a team
+  twice in the dropdown;
+- data leagues nobody listed in leagues.py are added under "Others", so the
+  dropdowns follow the data.
+
+A league with no data at all has no IDs: its leagues.py names are kept as
+"listed" display names, with the old category rule for its version
+("Others" is v2, everything else v1).
+"""
+
+import logging
+import unicodedata
+import numpy as np
+import pandas as pd
+from leagues import leagues as LEAGUES
+
+VERSIONS = ("v1", "v2")
+LEAGUE_COLUMNS = {"v1": ("Div",), "v2": ("Country", "League")}
+DATA_CATEGORY = "Others"
+MIN_LEAGUE_MATCHES = 50
+# Canonical name (as in the data) -> other spellings seen in fixtures and feeds.
+ALIASES = {
+    "Man United": ("Manchester United", "Man Utd"),
+    "Man City": ("Manchester City",),
+    "Nott'm Forest": ("Nottingham Forest", "Nottingham", "Notts Forest"),
+    "Sheffield Weds": ("Sheffield Wednesday",),
+    "Sheffield United": ("Sheffield Utd",),
+    "Wolves": ("Wolverhampton", "Wolverhampton Wanderers"),
+    "West Brom": ("West Bromwich", "West Bromwich Albion"),
+    "QPR": ("Queens Park Rangers",),
+    "Tottenham": ("Tottenham Hotspur", "Spurs"),
+    "Inter": ("Inter Milan", "Internazionale"),
+    "Milan": ("AC Milan",),
+    "Ath Madrid": ("Atletico Madrid", "Atlético Madrid"),
+    "Ath Bilbao": ("Athletic Bilbao", "Athletic Club"),
+    "Paris SG": ("PSG", "Paris Saint-Germain"),
+    "Bayern Munich": ("Bayern", "Bayern München"),
+    "FC Copenhagen": ("Copenhagen", "FC København"),
+}
+
+# Letters NFKD does not split into a base letter plus an accent.
+_TRANSLITERATE = str.maketrans({"ø": "o", "Ø": "O", "æ": "ae", "Æ": "AE", "ß": "ss", "ł": "l", "Ł": "L",
+                                "đ": "d", "Đ": "D", "ı": "i"})
+
+def normalize(name):
+    folded = unicodedata.normalize("NFKD", str(name).translate(_TRANSLITERATE)).casefold()
+    return "".join(c for c in folded if c.isalnum() and not unicodedata.combining(c))
+
+def season_labels(dates):
+    """'2023/2024' style labels for data without a Season column (seasons
+    start in July)."""
+    dates = pd.DatetimeIndex(dates)
+    start = dates.year - (dates.month < 7)
+    return pd.Index([f"{y}/{y + 1}" if y > 0 else None for y in start.fillna(-1).astype(int)])
+
+def _data_leagues(data, get_column_names, team_ids):
+    found = {}
+    for version in VERSIONS:
+        home_col, away_col, _ = get_column_names(version)
+        columns = [c for c in LEAGUE_COLUMNS[version] if c in data]
+        if home_col not in data or away_col not in data or not columns:
+            continue
+        rows = data[data[home_col].notna() & data[away_col].notna()]
+        league = rows[columns[0]].astype(str).to_numpy(dtype=object)
+        for col in columns[1:]:
+            league = league + " " + rows[col].astype(str).to_numpy(dtype=object)
+        seasons = np.asarray(season_labels(rows["Date"]), dtype=object)
+        if "Season" in rows:
+            # In the combined frame the v1 rows have an empty Season.
+            given = rows["Season"].astype(object).to_numpy()
+            seasons = np.where(pd.notna(given), given, seasons)
+        # One row per (league, season, team) that played.
+        sides = pd.DataFrame({
+            "league": np.concatenate([league, league]),
+            "season": np.concatenate([seasons, seasons]),
+            "team": np.concatenate([rows[home_col].astype(object).map(team_ids).to_numpy(),
+                                    rows[away_col].astype(object).map(team_ids).to_numpy()]),
+        }).drop_duplicates()
+        matches = pd.Series(league).value_counts()
+        for name, group in sides.groupby("league", sort=True):
+            found[name] = {
+                "version": version,
+                "matches": int(matches[name]),
+                "teams": sorted(group["team"].unique().tolist()),
+                "seasons": {season: sorted(part.tolist()) for season, part in group.groupby("season", sort=True)["team"]},
+            }
+    return found
+
+def build_metadata(data, get_column_names, leagues=LEAGUES):
+    names = set()
+    for version in VERSIONS:
+        home_col, away_col, _ = get_column_names(version)
+        for col in (home_col, away_col):
+            if col in data:
+                names.update(data[col].dropna().astype(object).unique())
+    names = sorted(names, key=str)
+    team_ids = {name: i for i, name in enumerate(names)}
+    aliases = {}
+    for name, i in team_ids.items():
+        aliases.setdefault(normalize(name), i)
+    for name, others in ALIASES.items():
+        if name in team_ids:
+            for other in others:
+                aliases.setdefault(normalize(other), team_ids[name])
+
+    meta = {"names": names, "team_ids": team_ids, "aliases": aliases, "leagues": {}, "categories": {}}
+    data_leagues = _data_leagues(data, get_column_names, team_ids)
+    matched = set()
+    without_data = []
+    for category, category_leagues in leagues.items():
+        for league, teams in category_leagues.items():
+            resolved = {team: resolve_team(meta, team) for team in teams}
+            ids = {i for i in resolved.values() if i is not None}
+            source = max(data_leagues, key=lambda k: len(ids & set(data_leagues[k]["teams"])), default=None)
+            if source is not None and not ids & set(data_leagues[source]["teams"]):
+                source = None
+            entry = {
+                "category": category,
+                "source": source,
+                "version": data_leagues[source]["version"] if source else ("v2" if category == "Others" else "v1"),
+                "seasons": data_leagues[source]["seasons"] if source else {},
+                "listed": [],
+            }
+            if source:
+                unresolved = [team for team, i in resolved.items() if i is None]
+                if unresolved:
+                    logging.warning(f"leagues.py names for {league} not found in the data: {', '.join(unresolved)}")
+                # The latest season's clubs, plus listed ones from elsewhere
+                # in the data (e.g. promoted since the last season).
+                current = set(entry["seasons"][max(entry["seasons"])])
+                entry["teams"] = sorted(current | ids, key=lambda i: str(names[i]))
+                matched.add(source)
+            else:
+                entry["teams"] = []
+                entry["listed"] = sorted(teams, key=str)
+                without_data.append(league)
+            meta["leagues"][league] = entry
+            meta["categories"].setdefault(category, []).append(league)
+    if without_data:
+        logging.info(f"No data for {', '.join(without_data)}; showing their leagues.py teams")
+    for source, found in data_leagues.items():
+        if source in matched or found["matches"] < MIN_LEAGUE_MATCHES or source in meta["leagues"]:
+            continue
+        latest = found["seasons"][max(found["seasons"])]
+        meta["leagues"][source] = {"category": DATA_CATEGORY, "source": source, "version": found["version"],
+                                   "seasons": found["seasons"], "listed": [],
+                                   "teams": sorted(latest, key=lambda i: str(names[i]))}
+        meta["categories"].setdefault(DATA_CATEGORY, []).append(source)
+    return meta
+
+def resolve_team(meta, name):
+    """The ID of a team name or alias, or None. An ID resolves to itself."""
+    if meta is None:
+        return None
+    if isinstance(name, (int, np.integer)):
+        return int(name) if 0 <= name < len(meta["names"]) else None
+    team_id = meta["team_ids"].get(name)
+    if team_id is None:
+        team_id = meta["aliases"].get(normalize(name))
+    return team_id
+
+def canonical_name(meta, name):
+    """The dataset's spelling of a team name or alias (the name itself when
+    it is unknown)."""
+    team_id = resolve_team(meta, name)
+    return name if team_id is None else meta["names"][team_id]
+
+def team_names(meta, ids):
+    return [meta["names"][i] for i in ids]
+
+def league_teams(meta, league, season=None):
+    """Team names for a league's dropdown, or for one of its seasons (the
+    leagues.py names when the league has no data)."""
+    entry = meta["leagues"][league]
+    if season is None:
+        return team_names(meta, entry["teams"]) + entry["listed"]
+    return team_names(meta, entry["seasons"].get(season, []))
+
+def league_version(meta, league):
+    entry = meta["leagues"].get(league)
+    return entry["version"] if entry else None
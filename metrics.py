@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""metrics.py
+
+Per-request stage timings, counters and values for the prediction path.
+
+    with metrics.request("predict", version="v2"):
+        with metrics.stage("form"):
+            ...
+        metrics.count("feature_table_hit")
+        metrics.observe("dataset_rows", len(data))
+
+Each finished request trace is handed to every registered sink. REGISTRY (an
+in-process histogram registry that can render Prometheus text) is always
+registered; set METRICS_LOG_SLOW_MS to also log a structured JSON line for
+every request at least that slow (0 logs all of them).
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = contextvars.ContextVar("metrics_trace", default=None)
+_sinks = []
+
+def _labels_text(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+class HistogramRegistry:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def observe_seconds(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.setdefault(key, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    hist["counts"][i] += 1
+            hist["sum"] += seconds
+            hist["count"] += 1
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def emit(self, trace):
+        labels = {"request": trace["name"], **trace["labels"]}
+        self.observe_seconds("prediction_request_seconds", trace["seconds"], **labels)
+        for stage, seconds in trace["stages"].items():
+            self.observe_seconds("prediction_stage_seconds", seconds, stage=stage, **labels)
+        for event, amount in trace["counters"].items():
+            self.increment("prediction_events_total", amount, event=event, **labels)
+        for name, value in trace["values"].items():
+            self.set_gauge(f"prediction_{name}", value, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            return (
+                {k: {"counts": list(v["counts"]), "sum": v["sum"], "count": v["count"]} for k, v in self._histograms.items()},
+                dict(self._counters),
+                dict(self._gauges),
+            )
+
+    def prometheus_text(self):
+        histograms, counters, gauges = self.snapshot()
+        lines = []
+        for name in sorted({k[0] for k in histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (hist_name, labels), hist in sorted(histograms.items()):
+                if hist_name != name:
+                    continue
+                labels = dict(labels)
+                for bound, count in zip(self.buckets, hist["counts"]):
+                    lines.append(f"{name}_bucket{_labels_text({**labels, 'le': bound})} {count}")
+                lines.append(f"{name}_bucket{_labels_text({**labels, 'le': '+Inf'})} {hist['count']}")
+                lines.append(f"{name}_sum{_labels_text(labels)} {hist['sum']}")
+                lines.append(f"{name}_count{_labels_text(labels)} {hist['count']}")
+        for kind, series in (("counter", counters), ("gauge", gauges)):
+            for name in sorted({k[0] for k in series}):
+                lines.append(f"# TYPE {name} {kind}")
+                for (series_name, labels), value in sorted(series.items()):
+                    if series_name == name:
+                        lines.append(f"{name}{_labels_text(dict(labels))} {value}")
+        return "\n".join(lines) + "\n"
+
+class LogSink:
+    def __init__(self, slow_ms=0.0, logger=None):
+        self.slow_ms = slow_ms
+        self.logger = logger or logging.getLogger("metrics")
+
+    def emit(self, trace):
+        if trace["seconds"] * 1000 < self.slow_ms:
+            return
+        record = {
+            "request": trace["name"],
+            **trace["labels"],
+            "total_ms": round(trace["seconds"] * 1000, 3),
+            "stages_ms": {k: round(v * 1000, 3) for k, v in trace["stages"].items()},
+            "counters": trace["counters"],
+            **trace["values"],
+        }
+        self.logger.info(json.dumps(record, default=str))
+
+REGISTRY = HistogramRegistry()
+
+def add_sink(sink):
+    _sinks.append(sink)
+    return sink
+
+def remove_sink(sink):
+    _sinks.remove(sink)
+
+def current_trace():
+    return _current.get()
+
+@contextmanager
+def request(name, **labels):
+    if _current.get() is not None:
+        # Nested inside another request (e.g. run_prediction under an API
+        # handler): record into the outer trace instead of starting a new one.
+        yield _current.get()
+        return
+    trace = {"name": name, "labels": labels, "stages": {}, "counters": {}, "values": {}}
+    token = _current.set(trace)
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        trace["seconds"] = time.perf_counter() - start
+        _current.reset(token)
+        for sink in list(_sinks):
+            try:
+                sink.emit(trace)
+            except Exception as e:
+                logging.error(f"Metrics sink {sink!r} failed: {e}")
+
+@contextmanager
+def stage(name):
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace["stages"][name] = trace["stages"].get(name, 0.0) + time.perf_counter() - start
+
+def count(name, amount=1):
+    trace = _current.get()
+    if trace is not None:
+        trace["counters"][name] = trace["counters"].get(name, 0) + amount
+
+def observe(name, value):
+    trace = _current.get()
+    if trace is not None:
+        trace["values"][name] = value
+
+add_sink(REGISTRY)
+if os.environ.get("METRICS_LOG_SLOW_MS"):
+    add_sink(LogSink(float(os.environ["METRICS_LOG_SLOW_MS"])))
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""model_registry.py
+
+Lazily loaded, memoised models. Nothing is unpickled (and so neither sklearn
+nor xgboost is imported) until a model is first asked for; warm_up() can do
+that in a background thread, including one throwaway prediction so the first
+real request does not pay for lazy initialisation inside the estimator.
+
+With MODEL_ENGINE=compiled, serving_model() hands out the tree_engine
+compilation of a model instead. The compiled arrays are checked against the
+estimator once and cached under CACHE_DIR next to the model's fingerprint,
+so later starts load them without unpickling the model at all.
+"""
+
+import os
+import json
+import logging
+import threading
+import joblib
+import pandas as pd
+from constants import MODEL_FILES, CACHE_DIR
+from data_loader import required_columns
+from fetch import ensure_artifacts, manifest_features
+from startup import timed_phase
+
+MODEL_MMAP_MODE = os.environ.get("MODEL_MMAP_MODE") or None
+MODEL_ENGINE = os.environ.get("MODEL_ENGINE", "sklearn")
+
+_models = {}
+_compiled = {}
+_locks = {name: threading.Lock() for name in MODEL_FILES}
+_compile_locks = {name: threading.Lock() for name in MODEL_FILES}
+
+def get_model(name, mmap_mode=MODEL_MMAP_MODE):
+    model = _models.get(name)
+    if model is not None:
+        return model
+    with _locks[name]:
+        if name not in _models:
+            path = MODEL_FILES[name]
+            ensure_artifacts([path])
+            with timed_phase(f"model load ({path})"):
+                _models[name] = joblib.load(path, mmap_mode=mmap_mode)
+        return _models[name]
+
+def load_model_file(path):
+    """A model from an explicit file rather than the registry: a pickled
+    estimator, or a tree_engine .npz."""
+    if path.endswith(".npz"):
+        from tree_engine import load_compiled
+        return load_compiled(path)
+    return joblib.load(path)
+
+def is_loaded(name):
+    return name in _models
+
+def forget_model(name):
+    """Drop the memoised model and its compilation, so the next request for
+    it reads the (replaced) file again. Callers holding the old object keep it."""
+    with _locks[name]:
+        _models.pop(name, None)
+    with _compile_locks[name]:
+        _compiled.pop(name, None)
+
+def _fingerprint(path):
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def get_compiled_model(name, cache_dir=CACHE_DIR):
+    engine = _compiled.get(name)
+    if engine is not None:
+        return engine
+    from tree_engine import check_model, compile_model, load_compiled, probe_matrix, save_compiled
+    with _compile_locks[name]:
+        if name in _compiled:
+            return _compiled[name]
+        path = MODEL_FILES[name]
+        cached = os.path.join(cache_dir, f"{os.path.basename(path)}.engine.npz")
+        fingerprint = _fingerprint(path)
+        engine = None
+        if fingerprint is not None and os.path.exists(cached):
+            try:
+                engine = load_compiled(cached)
+                if engine.meta.get("fingerprint") != fingerprint:
+                    engine = None
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"Ignoring compiled model cache {cached}: {e}")
+                engine = None
+        if engine is None:
+            model = get_model(name)
+            with timed_phase(f"model compile ({path})"):
+                engine = compile_model(model)
+                error = check_model(engine, model, probe_matrix(engine))
+            logging.info(f"Compiled {name}: {engine!r}, max |dp| {error:.2g}")
+            fingerprint = _fingerprint(path)
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                save_compiled(engine, cached, fingerprint=fingerprint)
+            except OSError as e:
+                logging.warning(f"Could not cache compiled {name}: {e}")
+        _compiled[name] = engine
+        return engine
+
+def serving_model(name, engine=None):
+    """The object the request path calls predict/predict_proba on: the
+    estimator itself, or its compiled form when MODEL_ENGINE=compiled."""
+    if (engine or MODEL_ENGINE) != "compiled":
+        return get_model(name)
+    try:
+        return get_compiled_model(name)
+    except ValueError as e:
+        logging.warning(f"Serving {name} uncompiled: {e}")
+        return get_model(name)
+
+def model_feature_names(name, cache_dir=CACHE_DIR):
+    """feature_names_in_ of a model, so the dataset column projection can be
+    worked out without unpickling it: from manifest.json when it describes
+    the file on disk, else from a sidecar under cache_dir written the first
+    time the model had to be unpickled for them."""
+    path = MODEL_FILES[name]
+    features = manifest_features(path)
+    if features is not None:
+        return features
+    sidecar = os.path.join(cache_dir, f"{os.path.basename(path)}.features.json")
+    fingerprint = _fingerprint(path)
+    if fingerprint is not None:
+        try:
+            with open(sidecar) as f:
+                cached = json.load(f)
+            if cached["fingerprint"] == fingerprint:
+                return cached["features"]
+        except (OSError, ValueError, KeyError):
+            pass
+    features = [str(f) for f in getattr(get_model(name), "feature_names_in_", [])]
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(sidecar, "w") as f:
+            json.dump({"fingerprint": fingerprint, "features": features}, f)
+    except OSError as e:
+        logging.warning(f"Could not cache feature names for {name}: {e}")
+    return features
+
+def dataset_columns():
+    return required_columns([f for name in MODEL_FILES for f in model_feature_names(name)])
+
+def warm_up_model(name):
+    model = serving_model(name)
+    features = getattr(model, "feature_names_in_", None)
+    if features is None:
+        return model
+    with timed_phase(f"model warm-up ({name})"):
+        sample = pd.DataFrame([[0.0] * len(features)], columns=features)
+        model.predict(sample)
+        model.predict_proba(sample)
+    return model
+
+def warm_up(names=None, background=True):
+    names = list(names or MODEL_FILES)
+
+    def run():
+        for name in names:
+            try:
+                warm_up_model(name)
+            except Exception as e:
+                logging.error(f"Warm-up of {name} failed: {e}")
+
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name="model-warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -9,31 +9,39 @@ Original file is located at
 
 import pandas as pd
 import logging
+import metrics
+from matchup_index import select_matchup
+from feature_table import feature_frame
 
 def align_features(input_df, model):
-    for f in model.feature_names_in_:
-        if f not in input_df:
-            input_df[f] = 0
-    return input_df[model.feature_names_in_]
+    return input_df.reindex(columns=model.feature_names_in_, fill_value=0)
 
-def compute_mean_for_teams(home, away, data, model, get_column_names, version="v1"):
+def compute_mean_for_teams(home, away, data, model, get_column_names, version="v1", index=None,
+                           feature_table=None):
+    if feature_table is not None:
+        with metrics.stage("feature_mean"):
+            input_df = feature_frame(feature_table, home, away)
+        metrics.count("feature_table_hit" if input_df is not None else "feature_table_miss")
+        return input_df
     home_col, away_col, result_col = get_column_names(version)
-    h2h = data[(data[home_col] == home) & (data[away_col] == away)]
-    if h2h.empty:
-        return None
-    h2h = h2h.drop(columns=[result_col, "Date", "Country", "League", "Season", "Time"], errors='ignore')
-    if version == "v1" and 'HTR' in h2h:
-        h2h['HTR'] = h2h['HTR'].replace({'H': 1, 'D': 2, 'A': 3})
-    mean = h2h.mean(numeric_only=True)
-    if 'HTR' in mean:
-        if 0 <= mean['HTR'] <= 1.4:
-            mean['HTR'] = 'H'
-        elif 1.5 <= mean['HTR'] <= 2.4:
-            mean['HTR'] = 'D'
-        elif 2.5 <= mean['HTR'] <= 3.4:
-            mean['HTR'] = 'A'
-    input_df = pd.DataFrame([mean])
-    return align_features(input_df, model)
+    with metrics.stage("feature_mean"):
+        h2h = select_matchup(home, away, data, get_column_names, version, index)
+        if h2h.empty:
+            return None
+        h2h = h2h.drop(columns=[result_col, "Date", "Country", "League", "Season", "Time"], errors='ignore')
+        if version == "v1" and 'HTR' in h2h:
+            h2h['HTR'] = h2h['HTR'].replace({'H': 1, 'D': 2, 'A': 3})
+        mean = h2h.mean(numeric_only=True)
+        if 'HTR' in mean:
+            if 0 <= mean['HTR'] <= 1.4:
+                mean['HTR'] = 'H'
+            elif 1.5 <= mean['HTR'] <= 2.4:
+                mean['HTR'] = 'D'
+            elif 2.5 <= mean['HTR'] <= 3.4:
+                mean['HTR'] = 'A'
+        input_df = pd.DataFrame([mean])
+    with metrics.stage("alignment"):
+        return align_features(input_df, model)
 
 def predict_with_confidence(model, input_df):
     try:
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""outcomes.py
+
+Vectorised match outcomes. Teams are encoded as their metadata team IDs
+(queries take IDs or names) and results as small ints (H/D/A -> 0/1/2,
+missing -> -1); every match is expanded into one entry per side with that
+team's outcome (W/D/L -> 0/1/2) and goals, in one NumPy pass, and the
+entries are grouped per team and per pair (CSR style, chronological within
+each group). W/D/L rates and goal aggregates for a team or a pair are then
+array slices, and whole-league queries (league_table, league_form) are a
+handful of bincounts. Single-team and head-to-head form strings come from
+form.py's ring buffers.
+
+A missing result counts as a loss for both sides, as in the app's form
+strings.
+"""
+
+import numpy as np
+import pandas as pd
+from form import FORM_SIZE
+from metadata import build_metadata, resolve_team
+
+RESULTS = ("H", "D", "A")
+HOME, DRAW_RESULT, AWAY = 0, 1, 2
+WIN, DRAW, LOSS = 0, 1, 2
+LETTERS = np.array(["W", "D", "L"])
+POINTS = np.array([3, 1, 0])
+GOAL_COLUMNS = {"v1": ("FTHG", "FTAG"), "v2": ("HG", "AG")}
+
+def encode_results(values):
+    values = pd.Series(values).astype(object).to_numpy()
+    codes = np.full(len(values), -1, dtype=np.int8)
+    for code, result in enumerate(RESULTS):
+        codes[values == result] = code
+    return codes
+
+def side_outcomes(results, is_home):
+    """W/D/L codes of one side of each match, given encoded results."""
+    won = np.where(is_home, results == HOME, results == AWAY)
+    return np.where(won, WIN, np.where(results == DRAW_RESULT, DRAW, LOSS)).astype(np.int8)
+
+def outcome_letters(results, is_home):
+    return "".join(LETTERS[side_outcomes(encode_results(results), np.asarray(is_home, dtype=bool))])
+
+def build_outcome_engine(data, get_column_names, versions=("v1", "v2"), metadata=None):
+    metadata = build_metadata(data, get_column_names) if metadata is None else metadata
+    teams = np.array(metadata["names"], dtype=object)
+    engine = {}
+    for version in versions:
+        home_col, away_col, result_col = get_column_names(version)
+        if home_col not in data or away_col not in data or "Date" not in data:
+            continue
+        goal_cols = [c for c in GOAL_COLUMNS.get(version, ()) if c in data]
+        df = data[[home_col, away_col, result_col, "Date"] + goal_cols]
+        df = df.dropna(subset=[home_col, away_col, "Date"]).sort_values("Date", kind="stable")
+        n = len(df)
+        home = df[home_col].astype(object).map(metadata["team_ids"]).to_numpy(dtype=np.int32)
+        away = df[away_col].astype(object).map(metadata["team_ids"]).to_numpy(dtype=np.int32)
+        results = encode_results(df[result_col])
+        if len(goal_cols) == 2:
+            home_goals = df[goal_cols[0]].to_numpy(dtype=np.float64, na_value=np.nan)
+            away_goals = df[goal_cols[1]].to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            home_goals = away_goals = np.full(n, np.nan)
+
+        # One entry per side of every match, grouped by team and in match
+        # (= date) order within each team.
+        team = np.concatenate([home, away])
+        match = np.concatenate([np.arange(n), np.arange(n)])
+        order = np.lexsort((match, team))
+        indptr = np.searchsorted(team[order], np.arange(len(teams) + 1))
+        match = match[order]
+        is_home = np.concatenate([np.ones(n, dtype=bool), np.zeros(n, dtype=bool)])[order]
+
+        pair_key = np.minimum(home, away).astype(np.int64) * len(teams) + np.maximum(home, away)
+        pair_order = np.argsort(pair_key, kind="stable")
+
+        engine[version] = {
+            "metadata": metadata,
+            "teams": teams,
+            "dates": df["Date"].to_numpy(),
+            "home": home,
+            "away": away,
+            "results": results,
+            "home_goals": home_goals,
+            "away_goals": away_goals,
+            "team": team[order],
+            "team_indptr": indptr,
+            "team_match": match,
+            "team_is_home": is_home,
+            "team_outcome": np.concatenate([side_outcomes(results, True), side_outcomes(results, False)])[order],
+            "team_goals_for": np.concatenate([home_goals, away_goals])[order],
+            "team_goals_against": np.concatenate([away_goals, home_goals])[order],
+            "pair_keys": pair_key[pair_order],
+            "pair_matches": pair_order,
+        }
+    return engine
+
+def _code(table, team):
+    return resolve_team(table["metadata"], team) if table is not None else None
+
+def team_matches(engine, version, team):
+    """Positions into the team_* arrays for one team, oldest first."""
+    table = engine.get(version)
+    code = _code(table, team)
+    if code is None:
+        return np.empty(0, dtype=np.intp)
+    return np.arange(table["team_indptr"][code], table["team_indptr"][code + 1])
+
+def pair_matches(engine, version, home, away):
+    """Match indices of every meeting of two teams (either way round), oldest first."""
+    table = engine.get(version)
+    a, b = _code(table, home), _code(table, away)
+    if a is None or b is None:
+        return np.empty(0, dtype=np.intp)
+    key = min(a, b) * len(table["teams"]) + max(a, b)
+    lo, hi = np.searchsorted(table["pair_keys"], [key, key + 1])
+    return table["pair_matches"][lo:hi]
+
+def _summary(outcomes, goals_for, goals_against):
+    played = len(outcomes)
+    counts = np.bincount(outcomes, minlength=3)
+    with np.errstate(invalid="ignore"):
+        return {
+            "played": played,
+            "won": int(counts[WIN]),
+            "drawn": int(counts[DRAW]),
+            "lost": int(counts[LOSS]),
+            "win_rate": counts[WIN] / played if played else np.nan,
+            "draw_rate": counts[DRAW] / played if played else np.nan,
+            "loss_rate": counts[LOSS] / played if played else np.nan,
+            "goals_for": float(np.nanmean(goals_for)) if played else np.nan,
+            "goals_against": float(np.nanmean(goals_against)) if played else np.nan,
+        }
+
+def _check_last(last):
+    if last is not None and last < 1:
+        raise ValueError(f"last must be at least 1, got {last}")
+
+def team_summary(engine, version, team, last=None):
+    """W/D/L counts and rates and mean goals for/against over a team's
+    matches (or its last `last` matches)."""
+    _check_last(last)
+    table = engine.get(version)
+    positions = team_matches(engine, version, team)
+    if last is not None:
+        positions = positions[-last:]
+    if table is None:
+        return _summary(np.empty(0, dtype=np.int8), [], [])
+    return _summary(table["team_outcome"][positions], table["team_goals_for"][positions],
+                    table["team_goals_against"][positions])
+
+def head_to_head_summary(engine, version, home, away, last=None):
+    """The same as team_summary, over the meetings of two teams and from
+    `home`'s side."""
+    _check_last(last)
+    table = engine.get(version)
+    matches = pair_matches(engine, version, home, away)
+    if last is not None:
+        matches = matches[-last:]
+    if table is None or not len(matches):
+        return _summary(np.empty(0, dtype=np.int8), [], [])
+    home_is_home = table["home"][matches] == _code(table, home)
+    goals_for = np.where(home_is_home, table["home_goals"][matches], table["away_goals"][matches])
+    goals_against = np.where(home_is_home, table["away_goals"][matches], table["home_goals"][matches])
+    return _summary(side_outcomes(table["results"][matches], home_is_home), goals_for, goals_against)
+
+def _team_entries(table, codes, since=None, last=None):
+    """Mask over the team_* arrays selecting the entries of the given team
+    codes, optionally only matches on/after `since` and each team's last
+    `last` of those."""
+    _check_last(last)
+    selected = np.zeros(len(table["teams"]), dtype=bool)
+    selected[codes] = True
+    mask = selected[table["team"]]
+    if since is not None:
+        mask &= table["dates"][table["team_match"]] >= np.datetime64(pd.Timestamp(since))
+    if last is not None:
+        # Rank entries from the newest within each team: the running count of
+        # selected entries, taken from the end of each team's group.
+        from_end = np.cumsum(mask[::-1])[::-1]
+        group_end = np.append(from_end, 0)[table["team_indptr"][1:]][table["team"]]
+        mask &= (from_end - group_end) <= last
+    return mask
+
+def league_form(engine, version, teams, n=FORM_SIZE, since=None):
+    """Form strings for many teams at once: {team: "WDLWW"}."""
+    table = engine.get(version)
+    if table is None:
+        return {team: "" for team in teams}
+    codes = {team: _code(table, team) for team in teams}
+    mask = _team_entries(table, [c for c in codes.values() if c is not None], since, n)
+    letters = LETTERS[table["team_outcome"][mask]]
+    owners = table["team"][mask]
+    bounds = np.searchsorted(owners, np.arange(len(table["teams"]) + 1))
+    return {team: "".join(letters[bounds[code]:bounds[code + 1]][::-1]) if code is not None else ""
+            for team, code in codes.items()}
+
+def league_table(engine, version, teams, since=None, last=None):
+    """Played/W/D/L/goals/points for every team in `teams`, from all their
+    matches on/after `since` (or their last `last`), best first."""
+    columns = ["team", "played", "won", "drawn", "lost", "goals_for", "goals_against", "goal_diff", "points", "form"]
+    table = engine.get(version)
+    if table is None:
+        return pd.DataFrame(columns=columns)
+    n_teams = len(table["teams"])
+    codes = [_code(table, t) for t in teams]
+    codes = np.array([-1 if c is None else c for c in codes], dtype=np.intp)
+    mask = _team_entries(table, codes[codes >= 0], since, last)
+    owners = table["team"][mask]
+    outcome = table["team_outcome"][mask]
+
+    def per_team(weights=None):
+        totals = np.bincount(owners, weights=weights, minlength=n_teams)
+        return np.where(codes >= 0, totals[np.maximum(codes, 0)], 0)
+
+    goals_for = per_team(np.nan_to_num(table["team_goals_for"][mask]))
+    goals_against = per_team(np.nan_to_num(table["team_goals_against"][mask]))
+    result = pd.DataFrame({
+        "team": list(teams),
+        "played": per_team().astype(int),
+        "won": per_team((outcome == WIN).astype(float)).astype(int),
+        "drawn": per_team((outcome == DRAW).astype(float)).astype(int),
+        "lost": per_team((outcome == LOSS).astype(float)).astype(int),
+        "goals_for": goals_for.astype(int),
+        "goals_against": goals_against.astype(int),
+        "goal_diff": (goals_for - goals_against).astype(int),
+        "points": per_team(POINTS[outcome].astype(float)).astype(int),
+    })
+    form = league_form(engine, version, teams, since=since)
+    result["form"] = result["team"].map(form)
+    return result.sort_values(["points", "goal_diff", "goals_for"], ascending=False, kind="stable",
+                              ignore_index=True)[columns]
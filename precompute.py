@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""precompute.py
+
+Prediction results for every (home, away) pair of every league in the team
+metadata (the leagues.py leagues plus unlisted leagues found in the data),
+computed ahead of time and stored as one structured .npy the app memory-maps,
+so answering a request is a dict lookup with no model call.
+
+    python precompute.py              # build, or refresh if a table exists
+    python precompute.py --full       # always rebuild every pair
+
+A row holds what the app shows for a fixture: the final prediction, the
+model's class probabilities, the historical H/D/A percentages and number of
+meetings, both teams' recent form and the most recent head-to-head results.
+Rows are built with batch.predict_fixtures, so they match run_prediction.
+
+The table remembers, per schema, how many matches it was built from and a
+hash of them. If the dataset has only grown since, refresh() recomputes just
+the pairs involving a team that played in the new matches (their form
+changed even when their head-to-head did not) and keeps the rest. Any other
+change (edited rows, a new model, a changed league list) rebuilds everything.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from analytics import get_column_names, get_team_recent_form
+from batch import OUTCOMES, OUTCOME_LABELS, predict_fixtures
+from constants import CACHE_DIR, MODEL_FILES
+from data_loader import file_fingerprint, load_dataset
+from feature_table import build_feature_table
+from form import FORM_SIZE, build_form_state
+from matchup_index import build_matchup_index, matchup_positions
+from metadata import build_metadata, league_teams
+from model_registry import serving_model
+
+TABLE_FORMAT = 1
+TABLE_DIR = os.path.join(CACHE_DIR, "predictions")
+H2H_RECENT = 10
+VERSIONS = ("v1", "v2")
+
+TABLE_DTYPE = np.dtype([
+    ("matches", "i4"),
+    ("final", "U32"),
+    ("model_conf", "f4", (3,)),
+    ("hist", "f4", (3,)),
+    ("home_form", f"U{FORM_SIZE}"),
+    ("away_form", f"U{FORM_SIZE}"),
+    ("h2h_recent", f"U{H2H_RECENT}"),
+    ("h2h_last", "M8[D]"),
+])
+
+def league_pairs(metadata):
+    pairs = {}
+    for league, entry in metadata["leagues"].items():
+        teams = league_teams(metadata, league)
+        for home in teams:
+            for away in teams:
+                if home != away:
+                    pairs.setdefault((entry["version"], home, away), league)
+    return [(league, version, home, away) for (version, home, away), league in pairs.items()]
+
+def _version_rows(data, version):
+    home_col, away_col, result_col = get_column_names(version)
+    if home_col not in data or away_col not in data:
+        return np.empty(0, dtype=np.intp), None
+    positions = np.flatnonzero(data[home_col].notna().to_numpy())
+    return positions, data[[home_col, away_col, result_col, "Date"]]
+
+def _rows_hash(frame, positions):
+    if frame is None or not len(positions):
+        return None
+    hashed = pd.util.hash_pandas_object(frame.take(positions).astype(object), index=False)
+    return hashlib.sha256(hashed.to_numpy().tobytes()).hexdigest()
+
+def data_state(data):
+    state = {}
+    for version in VERSIONS:
+        positions, frame = _version_rows(data, version)
+        state[version] = {"rows": int(len(positions)), "sha256": _rows_hash(frame, positions)}
+    return state
+
+def model_state():
+    return {v: (file_fingerprint(path) or {}).get("sha256") for v, path in MODEL_FILES.items()}
+
+def compute_rows(keys, data, models, index, form_state, feature_tables):
+    rows = np.zeros(len(keys), dtype=TABLE_DTYPE)
+    rows["h2h_last"] = np.datetime64("NaT")
+    if not keys:
+        return rows
+    fixtures = pd.DataFrame([(league, home, away) for league, _, home, away in keys],
+                            columns=["league", "home", "away"])
+    results = predict_fixtures(fixtures, models, data, index, feature_tables)
+    rows["matches"] = results["matches"].to_numpy()
+    rows["final"] = results["final_prediction"].fillna("").to_numpy(dtype=str)
+    rows["model_conf"] = results[[f"model_{o}" for o in OUTCOMES]].to_numpy(dtype=np.float32)
+    rows["hist"] = results[[f"hist_{o}" for o in OUTCOMES]].to_numpy(dtype=np.float32)
+
+    for i, (_, version, home, away) in enumerate(keys):
+        rows["home_form"][i] = get_team_recent_form(home, data, version, index=index, form_state=form_state)
+        rows["away_form"][i] = get_team_recent_form(away, data, version, index=index, form_state=form_state)
+        positions = matchup_positions(index, version, home, away)
+        if not len(positions):
+            continue
+        _, _, result_col = get_column_names(version)
+        dates = data["Date"].to_numpy()[positions]
+        results = data[result_col].take(positions).astype(object).fillna("-").to_numpy()
+        order = np.argsort(dates, kind="stable")[::-1][:H2H_RECENT]
+        rows["h2h_recent"][i] = "".join(results[order])
+        rows["h2h_last"][i] = dates[order[0]]
+    return rows
+
+def write_table(rows, meta, table_dir=TABLE_DIR):
+    tmp_dir = f"{table_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, "table.npy"), rows)
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    shutil.rmtree(table_dir, ignore_errors=True)
+    os.replace(tmp_dir, table_dir)
+
+def load_table(table_dir=TABLE_DIR, mmap_mode="r"):
+    """The stored table as a dict (meta, rows, lookup) or None if there is none."""
+    try:
+        with open(os.path.join(table_dir, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format") != TABLE_FORMAT:
+            return None
+        rows = np.load(os.path.join(table_dir, "table.npy"), mmap_mode=mmap_mode)
+    except (OSError, ValueError) as e:
+        if not isinstance(e, FileNotFoundError):
+            logging.warning(f"Ignoring prediction table in {table_dir}: {e}")
+        return None
+    lookup = {(version, home, away): i for i, (_, version, home, away) in enumerate(meta["keys"])}
+    return {"meta": meta, "rows": rows, "lookup": lookup}
+
+def current_table(data_version, table_dir=TABLE_DIR):
+    """The stored table if it was built from this dataset and the current
+    model files, else None (and requests are served live)."""
+    table = load_table(table_dir)
+    if table is None:
+        return None
+    if table["meta"]["data_version"] != data_version or table["meta"]["models"] != model_state():
+        logging.info(f"Prediction table in {table_dir} is stale, serving predictions live")
+        return None
+    return table
+
+def lookup(table, version, home, away):
+    """The precomputed result for a fixture, {"matches": 0} if the pair has
+    never met, or None if the pair is not in the table."""
+    if table is None:
+        return None
+    i = table["lookup"].get((version, home, away))
+    if i is None:
+        return None
+    row = table["rows"][i]
+    if row["matches"] == 0:
+        return {"matches": 0}
+    conf = row["model_conf"]
+    return {
+        "matches": int(row["matches"]),
+        "final": str(row["final"]),
+        "model_confidence": {k: float(conf[k - 1]) for k in OUTCOME_LABELS if not np.isnan(conf[k - 1])},
+        "probabilities": {o: float(p) for o, p in zip(OUTCOMES, row["hist"])},
+        "home_form": str(row["home_form"]),
+        "away_form": str(row["away_form"]),
+        "h2h_recent": str(row["h2h_recent"]),
+        "h2h_last": None if np.isnat(row["h2h_last"]) else str(row["h2h_last"]),
+    }
+
+def _context(data, models, metadata):
+    index = build_matchup_index(data, get_column_names, metadata=metadata)
+    form_state = build_form_state(data, get_column_names, metadata=metadata)
+    feature_tables = {v: build_feature_table(data, m, get_column_names, v, metadata) for v, m in models.items()}
+    return index, form_state, feature_tables
+
+def build(data, models, table_dir=TABLE_DIR, metadata=None):
+    metadata = build_metadata(data, get_column_names) if metadata is None else metadata
+    keys = league_pairs(metadata)
+    rows = compute_rows(keys, data, models, *_context(data, models, metadata))
+    meta = {
+        "format": TABLE_FORMAT,
+        "data_version": data.attrs.get("data_version"),
+        "data": data_state(data),
+        "models": model_state(),
+        "keys": [list(k) for k in keys],
+    }
+    write_table(rows, meta, table_dir)
+    logging.info(f"Precomputed {len(keys)} pairs into {table_dir}")
+    return len(keys)
+
+def new_teams(data, stored):
+    """Teams per schema that played in matches appended since the table was
+    built, or None when the data changed in any other way."""
+    teams = {}
+    for version in VERSIONS:
+        positions, frame = _version_rows(data, version)
+        old = stored.get(version, {"rows": 0, "sha256": None})
+        if len(positions) < old["rows"] or _rows_hash(frame, positions[:old["rows"]]) != old["sha256"]:
+            return None
+        if frame is None:
+            continue
+        added = frame.take(positions[old["rows"]:])
+        home_col, away_col, _ = get_column_names(version)
+        teams[version] = set(added[home_col].astype(object)) | set(added[away_col].astype(object))
+    return teams
+
+def refresh(data, models, table_dir=TABLE_DIR):
+    table = load_table(table_dir, mmap_mode=None)
+    metadata = build_metadata(data, get_column_names)
+    keys = league_pairs(metadata)
+    if table is None or table["meta"]["keys"] != [list(k) for k in keys] or table["meta"]["models"] != model_state():
+        return build(data, models, table_dir, metadata)
+    teams = new_teams(data, table["meta"]["data"])
+    if teams is None:
+        logging.info("Match data changed beyond appended rows, rebuilding the prediction table")
+        return build(data, models, table_dir, metadata)
+
+    stale = [i for i, (_, version, home, away) in enumerate(keys)
+             if home in teams.get(version, ()) or away in teams.get(version, ())]
+    rows = np.array(table["rows"])
+    if stale:
+        rows[stale] = compute_rows([keys[i] for i in stale], data, models, *_context(data, models, metadata))
+    meta = {**table["meta"], "data_version": data.attrs.get("data_version"), "data": data_state(data)}
+    write_table(rows, meta, table_dir)
+    logging.info(f"Refreshed {len(stale)} of {len(keys)} pairs in {table_dir}")
+    return len(stale)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute predictions for every league pair")
+    parser.add_argument("--full", action="store_true", help="rebuild every pair")
+    parser.add_argument("--engine", choices=["sklearn", "compiled"], help="model engine (defaults to MODEL_ENGINE)")
+    parser.add_argument("-d", "--table-dir", default=TABLE_DIR)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    data = load_dataset()
+    models = {v: serving_model(v, args.engine) for v in VERSIONS if get_column_names(v)[0] in data}
+    (build if args.full else refresh)(data, models, args.table_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""startup.py
+
+Wall-clock timings for the one-off phases of a cold start (imports, CSV load,
+index build, model load). Each phase is recorded the first time it runs, so
+Streamlit reruns do not overwrite the cold-start numbers.
+"""
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+STARTUP_TIMINGS = {}
+_lock = threading.Lock()
+_started = time.perf_counter()
+
+@contextmanager
+def timed_phase(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            first = name not in STARTUP_TIMINGS
+            if first:
+                STARTUP_TIMINGS[name] = elapsed
+        if first:
+            logging.info(f"startup: {name} took {elapsed:.3f}s")
+
+def startup_report():
+    with _lock:
+        report = dict(STARTUP_TIMINGS)
+    report["since_process_start"] = time.perf_counter() - _started
+    return report
+
+def log_startup_report():
+    report = startup_report()
+    logging.info("startup timings: " + ", ".join(f"{k}={v:.3f}s" for k, v in report.items()))
+    return report
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""store.py
+
+Hot-reloadable dataset and models. A Store holds one snapshot: the dataset,
+the structures derived from it (matchup index, form ring buffers, outcome
+engine), the prediction table, and the models and feature tables loaded so
+far. A watcher thread polls the files the snapshot was built from; when some
+change, the next snapshot is built off the request path and swapped in with
+a single reference assignment. Requests take a snapshot once and use only
+that, so the ones already running finish on the old version.
+
+Only what depends on a changed file is rebuilt, the rest is carried over:
+
+    football_data*.csv             dataset, metadata, index, form, outcomes, feature tables, prediction table
+    model*.pkl                     that model and its feature table, prediction table
+    .cache/predictions/meta.json   prediction table
+
+A file counts as changed once its size and mtime have held still for one
+poll, so a CSV that is still being copied in is not read half-written.
+Every snapshot the watcher builds has all its models loaded before the swap,
+and the watcher fills in the first snapshot's models before it starts
+polling, so a snapshot never loads a model file that changed after it was
+built. If one is asked for in that window anyway, model() raises instead of
+pairing the old data with the new model. Feature tables the old snapshot
+had built are rebuilt for the new one before the swap as well.
+
+dependency_key() names the files a response depends on, so callers can
+cache by it and keep what a swap did not touch.
+
+    store = Store()
+    store.start()                  # poll every STORE_POLL_SECONDS (0: never)
+    snapshot = store.snapshot()
+    model = store.model(snapshot, "v2")
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+import metrics
+from analytics import get_column_names
+from constants import MODEL_FILES
+from data_loader import DATA_FILES, load_dataset
+from feature_table import build_feature_table
+from form import build_form_state
+from matchup_index import build_matchup_index
+from metadata import build_metadata
+from model_registry import dataset_columns, forget_model, serving_model
+from outcomes import build_outcome_engine
+from precompute import TABLE_DIR, current_table
+from startup import timed_phase
+
+STORE_POLL_SECONDS = float(os.environ.get("STORE_POLL_SECONDS", "30"))
+DATA = ("data", None)
+PREDICTIONS = ("predictions", None)
+
+def _stat(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+class Store:
+    def __init__(self, paths=DATA_FILES, poll_seconds=STORE_POLL_SECONDS, on_swap=None):
+        self.paths = tuple(paths)
+        self.poll_seconds = poll_seconds
+        self.on_swap = on_swap
+        self._snapshot = None
+        self._pending = {}
+        self._reload_lock = threading.Lock()
+        self._fill_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def files(self):
+        """Watched path -> what depends on it."""
+        files = {path: DATA for path in self.paths}
+        files.update({path: ("model", name) for name, path in MODEL_FILES.items()})
+        files[os.path.join(TABLE_DIR, "meta.json")] = PREDICTIONS
+        return files
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._reload_lock:
+                if self._snapshot is None:
+                    self._swap(self._build(None, set(self.files().values())))
+                snapshot = self._snapshot
+        return snapshot
+
+    def _build(self, previous, changed):
+        # Stat before loading: a file replaced mid-load shows up on the next poll.
+        files = {path: _stat(path) for path in self.files()}
+        models = dict(previous["models"]) if previous else {}
+        feature_tables = dict(previous["feature_tables"]) if previous else {}
+        warm = set(feature_tables)
+        for kind, name in changed:
+            if kind == "model":
+                forget_model(name)
+                if models.pop(name, None) is not None:
+                    models[name] = serving_model(name)
+                feature_tables.pop(name, None)
+
+        # A new model may read columns the current projection left out.
+        columns = dataset_columns()
+        if previous is None or DATA in changed or columns != previous["columns"]:
+            with timed_phase("csv load"):
+                data = load_dataset(self.paths, columns=columns)
+            with timed_phase("index build"):
+                metadata = build_metadata(data, get_column_names)
+                derived = {
+                    "metadata": metadata,
+                    "index": build_matchup_index(data, get_column_names, metadata=metadata),
+                    "form_state": build_form_state(data, get_column_names, metadata=metadata),
+                    "outcomes": build_outcome_engine(data, get_column_names, metadata=metadata),
+                }
+            feature_tables = {}
+        else:
+            data = previous["data"]
+            derived = {k: previous[k] for k in ("metadata", "index", "form_state", "outcomes")}
+
+        data_version = data.attrs.get("data_version")
+        key = json.dumps([data_version, [files[path] for path in MODEL_FILES.values()]])
+        snapshot = {
+            "version": hashlib.sha256(key.encode()).hexdigest()[:16],
+            "data": data,
+            "data_version": data_version,
+            "columns": columns,
+            "files": files,
+            **derived,
+            "predictions": current_table(data_version),
+            "models": models,
+            "feature_tables": feature_tables,
+        }
+        if previous is not None:
+            self.fill_models(snapshot)
+            for name in warm:
+                self.feature_table(snapshot, name)
+        return snapshot
+
+    def fill_models(self, snapshot):
+        """Load every model the snapshot does not have yet."""
+        for name, path in MODEL_FILES.items():
+            if snapshot["files"].get(path) is not None:
+                self.model(snapshot, name)
+
+    def _swap(self, snapshot):
+        # A single reference assignment: readers see the old or the new snapshot, never a mix.
+        self._snapshot = snapshot
+        self._pending.clear()
+        logging.info(f"Serving snapshot {snapshot['version']} (dataset {snapshot['data_version']}, "
+                     f"{len(snapshot['data'])} rows)")
+        if self.on_swap is not None:
+            self.on_swap(snapshot)
+
+    def changes(self, settle=False):
+        """What changed on disk since the current snapshot was built. With
+        settle, a file only counts once it looks the same on two polls."""
+        current = self.snapshot()["files"]
+        changed = set()
+        for path, what in self.files().items():
+            stat = _stat(path)
+            if stat == current.get(path):
+                self._pending.pop(path, None)
+            elif not settle or self._pending.get(path) == stat:
+                changed.add(what)
+            else:
+                self._pending[path] = stat
+        return changed
+
+    def refresh(self, settle=False):
+        """Rebuild what depends on changed files and swap the result in;
+        returns the snapshot being served afterwards."""
+        self.snapshot()
+        with self._reload_lock:
+            changed = self.changes(settle)
+            if changed:
+                logging.info(f"Reloading for changed {', '.join(sorted(k if n is None else f'{k} {n}' for k, n in changed))}")
+                with metrics.request("store.reload"):
+                    self._swap(self._build(self._snapshot, changed))
+            return self._snapshot
+
+    def model(self, snapshot, name):
+        model = snapshot["models"].get(name)
+        if model is None:
+            with self._fill_lock:
+                model = snapshot["models"].get(name)
+                if model is None:
+                    path = MODEL_FILES[name]
+                    built = snapshot["files"].get(path)
+                    if built is not None and _stat(path) != built:
+                        raise RuntimeError(f"{path} changed after snapshot {snapshot['version']} was built")
+                    model = serving_model(name)
+                    if built is not None and _stat(path) != built:
+                        raise RuntimeError(f"{path} changed while loading it for snapshot {snapshot['version']}")
+                    snapshot["models"][name] = model
+        return model
+
+    def feature_table(self, snapshot, name):
+        table = snapshot["feature_tables"].get(name)
+        if table is None:
+            model = self.model(snapshot, name)
+            with self._fill_lock:
+                table = snapshot["feature_tables"].get(name)
+                if table is None:
+                    with timed_phase(f"feature table build ({name})"):
+                        table = build_feature_table(snapshot["data"], model, get_column_names, name,
+                                                    snapshot["metadata"])
+                    snapshot["feature_tables"][name] = table
+        return table
+
+    def dependency_key(self, snapshot, *what):
+        """Identifies the state of the given dependencies (DATA, PREDICTIONS,
+        ("model", name)) in a snapshot; it changes only when one of them does."""
+        files = self.files()
+        key = []
+        for dependency in what:
+            if dependency == DATA:
+                key.append(snapshot["data_version"])
+            else:
+                key.extend(tuple(snapshot["files"].get(p) or ()) for p, d in files.items() if d == dependency)
+        return tuple(key)
+
+    def start(self):
+        if self.poll_seconds <= 0 or self._thread is not None:
+            return self._thread
+
+        def run():
+            try:
+                self.fill_models(self.snapshot())
+            except Exception as e:
+                logging.error(f"Loading the models of snapshot {self._snapshot['version']} failed: {e}")
+            while not self._stop.wait(self.poll_seconds):
+                try:
+                    self.refresh(settle=True)
+                except Exception as e:
+                    logging.error(f"Reload failed, still serving snapshot {self._snapshot['version']}: {e}")
+
+        self._thread = threading.Thread(target=run, name="store-watcher", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
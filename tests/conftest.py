@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""conftest.py
+
+The app's modules are flat files in the repository root and read their data
+and model files relative to it, so tests run from there.
+
+tests/data/matches.csv is a slice of football_data2.csv (Denmark Superliga
+2022-2024 and Swiss Super League 2023/2024); the engines are checked against
+plain row-by-row reimplementations over it. tests/data/matches_v1.csv is a
+small made-up league in the v1 (football-data.co.uk Div/HomeTeam/FTR)
+schema, loaded with it for the combined-frame checks.
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MATCHES_CSV = os.path.join(ROOT, "tests", "data", "matches.csv")
+MATCHES_V1_CSV = os.path.join(ROOT, "tests", "data", "matches_v1.csv")
+sys.path.insert(0, ROOT)
+
+from analytics import get_column_names
+from data_loader import ingest_csv
+from metadata import build_metadata
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    return ROOT
+
+@pytest.fixture(scope="session")
+def matches():
+    data = ingest_csv([MATCHES_CSV])
+    data.attrs["data_version"] = "tests"
+    return data
+
+@pytest.fixture(scope="session")
+def combined():
+    """Both schemas in one frame, v1 file first as in DATA_FILES."""
+    return ingest_csv([MATCHES_V1_CSV, MATCHES_CSV])
+
+@pytest.fixture(scope="session")
+def metadata(matches):
+    return build_metadata(matches, get_column_names)
+
+@pytest.fixture(scope="session")
+def model(matches):
+    """A small tree fitted on the slice, with feature names like the bundled
+    models (a few odds columns the data has and one it does not)."""
+    from sklearn.tree import DecisionTreeClassifier
+    columns = ["PSCH", "PSCD", "PSCA", "AvgCH", "AvgCA", "B365H"]
+    X = matches.reindex(columns=columns).fillna(0)
+    y = matches["Res"].astype(object).map({"H": 1, "D": 2, "A": 3})
+    return DecisionTreeClassifier(max_depth=4, random_state=0).fit(X, y)
+
+def scan_rows(data, home, away, version="v2"):
+    """Row-by-row selection of a pair's matches, the shape of the original
+    per-request filtering."""
+    home_col, away_col, _ = get_column_names(version)
+    keep = [i for i, row in enumerate(data[[home_col, away_col]].itertuples(index=False))
+            if row[0] == home and row[1] == away]
+    return data.take(np.array(keep, dtype=np.intp))
+
+def chronological(data, version="v2"):
+    """(home, away, result, date) tuples in date order, stable."""
+    home_col, away_col, result_col = get_column_names(version)
+    df = data.dropna(subset=["Date", home_col, away_col]).sort_values("Date", kind="stable")
+    return list(zip(df[home_col].astype(object), df[away_col].astype(object),
+                    df[result_col].astype(object), pd.DatetimeIndex(df["Date"])))
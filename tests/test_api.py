@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+import pytest
+from fastapi.testclient import TestClient
+import api
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(api.app) as client:
+        yield client
+
+def test_table(client):
+    response = client.get("/table", params={"league": "Denmark League", "since": "2023-07-01", "last": 10})
+    assert response.status_code == 200
+    rows = response.json()["table"]
+    assert rows and all(row["played"] <= 10 for row in rows)
+    assert [row["points"] for row in rows] == sorted((row["points"] for row in rows), reverse=True)
+
+@pytest.mark.parametrize("params", [
+    {"since": "garbage"},
+    {"since": "2023-13-01"},
+    {"last": 0},
+    {"last": -3},
+    {"last": "ten"},
+])
+def test_table_rejects_bad_parameters(client, params):
+    response = client.get("/table", params={"league": "Denmark League", **params})
+    assert response.status_code == 422
+
+def test_table_unknown_league(client):
+    assert client.get("/table", params={"league": "Nope"}).status_code == 404
+
+def test_predict_needs_league_or_version(client):
+    assert client.get("/predict", params={"home": "Aarhus", "away": "Brondby"}).status_code == 400
+    assert client.get("/predict", params={"home": "Aarhus", "away": "Brondby", "version": "v9"}).status_code == 400
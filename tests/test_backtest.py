@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+from backtest import prior_history, shard_labels
+from batch import RESULT_CODES
+
+SOURCES = ["HG", "AG", "PSCH", "PSCD", "PSCA"]
+
+def brute_force(data, position):
+    """Means, H/D/A counts and number of the pair's meetings strictly before
+    the match at `position`."""
+    match = data.iloc[position]
+    earlier = data[(data["Home"] == match["Home"]) & (data["Away"] == match["Away"]) & (data["Date"] < match["Date"])]
+    means = earlier[SOURCES].astype(float).mean().to_numpy()
+    results = [(earlier["Res"] == code).sum() for code in RESULT_CODES]
+    return means, results, len(earlier)
+
+def test_matches_brute_force(matches):
+    positions, means, results, totals = prior_history(matches, "v2", SOURCES)
+    assert positions.tolist() == list(range(len(matches)))
+    assert totals.sum() > 0
+    for i, position in enumerate(positions):
+        expected_means, expected_results, expected_total = brute_force(matches, position)
+        assert totals[i] == expected_total
+        assert results[i].tolist() == expected_results
+        np.testing.assert_allclose(means[i], expected_means, rtol=1e-6, equal_nan=True)
+
+def test_same_day_meetings_do_not_see_each_other():
+    data = pd.DataFrame({
+        "Home": ["A", "A", "A", "B"],
+        "Away": ["B", "B", "B", "A"],
+        "Res": ["H", "D", "A", "H"],
+        "Date": pd.to_datetime(["2024-01-01", "2024-02-01", "2024-02-01", "2024-03-01"]),
+        "HG": [1.0, 2.0, np.nan, 0.0],
+        "AG": [0.0, 2.0, 3.0, 1.0],
+    })
+    positions, means, results, totals = prior_history(data, "v2", ["HG", "AG"])
+    assert totals.tolist() == [0, 1, 1, 0]
+    assert results[1].tolist() == results[2].tolist() == [1, 0, 0]
+    np.testing.assert_allclose(means[2], [1.0, 0.0])
+    assert np.isnan(means[0]).all() and np.isnan(means[3]).all()
+
+def test_rows_without_teams_or_date_are_skipped():
+    data = pd.DataFrame({
+        "Home": ["A", None, "A"],
+        "Away": ["B", "B", "B"],
+        "Res": ["H", "H", "A"],
+        "Date": pd.to_datetime(["2024-01-01", "2024-01-02", None]),
+        "HG": [1.0, 1.0, 1.0],
+    })
+    positions, _, _, totals = prior_history(data, "v2", ["HG"])
+    assert positions.tolist() == [0]
+    assert totals.tolist() == [0]
+
+def test_shard_labels_keep_countries_and_v1_seasons(combined):
+    league, season = shard_labels(combined[combined["Version"] == "v2"], "v2")
+    assert set(league) == {"Denmark Superliga", "Switzerland Super League"}
+    league, season = shard_labels(combined[combined["Version"] == "v1"], "v1")
+    assert set(league) == {"E0"}
+    assert set(season) == {"2022/2023", "2023/2024"}
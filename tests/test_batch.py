@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+import itertools
+import numpy as np
+import pytest
+from analytics import get_column_names
+from batch import OUTCOMES, predict_fixtures
+from controller import run_prediction
+from feature_table import build_feature_table
+from matchup_index import build_matchup_index
+
+LEAGUE = "Denmark League"
+
+@pytest.fixture(scope="module")
+def fixtures(metadata):
+    teams = [metadata["names"][i] for i in metadata["leagues"][LEAGUE]["teams"]]
+    return [(LEAGUE, home, away) for home, away in itertools.permutations(teams, 2)]
+
+@pytest.mark.parametrize("indexed", [False, True])
+def test_batch_matches_single_predictions(matches, metadata, model, fixtures, indexed):
+    index = build_matchup_index(matches, get_column_names, metadata=metadata) if indexed else None
+    tables = {"v2": build_feature_table(matches, model, get_column_names, "v2", metadata)} if indexed else None
+    results = predict_fixtures(fixtures, {"v2": model}, matches, index, tables)
+    assert len(results) == len(fixtures)
+    scored = 0
+    for (_, home, away), row in zip(fixtures, results.to_dict("records")):
+        final, conf, probs, *_ = run_prediction(home, away, model, matches, "v2")
+        if final is None:
+            assert row["matches"] == 0 and row["final_prediction"] is None
+            continue
+        scored += 1
+        assert row["version"] == "v2"
+        assert row["final_prediction"] == final
+        for outcome in OUTCOMES:
+            assert row[f"hist_{outcome}"] == pytest.approx(probs[outcome])
+        assert [row[f"model_{o}"] for o in OUTCOMES] == pytest.approx([conf[c] for c in (1, 2, 3)])
+    assert scored > 100
+
+def test_batch_resolves_aliases_and_skips_unknown_leagues(matches, model):
+    results = predict_fixtures([(LEAGUE, "copenhagen", "Brøndby"), (LEAGUE, "FC Copenhagen", "Brondby"),
+                                ("Nowhere", "FC Copenhagen", "Brondby")], {"v2": model}, matches)
+    assert results["home"].tolist() == ["copenhagen", "FC Copenhagen", "FC Copenhagen"]
+    assert results.loc[0, "matches"] == results.loc[1, "matches"] > 0
+    assert results.loc[0, "final_prediction"] == results.loc[1, "final_prediction"]
+    assert results.loc[2, "matches"] == 0 and np.isnan(results.loc[2, "hist_Draw"])
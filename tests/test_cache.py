@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import cache
+from cache import TTLCache
+
+def test_least_recently_used_entry_is_evicted():
+    lru = TTLCache(maxsize=2)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    assert lru.get("a") == 1  # "b" is now the least recently used
+    lru.put("c", 3)
+    assert len(lru) == 2
+    assert lru.get("b") is None
+    assert (lru.get("a"), lru.get("c")) == (1, 3)
+
+def test_put_refreshes_an_existing_key():
+    lru = TTLCache(maxsize=2)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    lru.put("a", 10)
+    lru.put("c", 3)
+    assert lru.get("a") == 10
+    assert lru.get("b") is None
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    ttl = TTLCache(maxsize=10, ttl=5)
+    ttl.put("a", 1)
+    now[0] += 4.9
+    assert ttl.get("a") == 1
+    now[0] += 0.2
+    assert ttl.get("a", "gone") == "gone"
+    assert len(ttl) == 0
+
+def test_hits_misses_and_falsy_values():
+    lru = TTLCache()
+    missing = object()
+    lru.put("none", None)
+    assert lru.get("none", missing) is None
+    assert lru.get("other", missing) is missing
+    assert (lru.hits, lru.misses) == (1, 1)
+    lru.clear()
+    assert len(lru) == 0
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+from conftest import scan_rows
+from analytics import get_column_names
+from feature_table import build_feature_table, feature_frame, pair_position, update_feature_table
+from model_utils import compute_mean_for_teams
+
+def scan_features(data, model, home, away):
+    """The pair's column means aligned to the model, with 0 for columns the
+    data does not have."""
+    rows = scan_rows(data, home, away)
+    means = rows.select_dtypes("number").mean()
+    return means.reindex(model.feature_names_in_).where(
+        pd.Index(model.feature_names_in_).isin(means.index), 0.0).to_numpy(dtype=np.float32)
+
+def test_rows_match_scan_means(matches, metadata, model):
+    table = build_feature_table(matches, model, get_column_names, "v2", metadata)
+    pairs = matches[["Home", "Away"]].astype(object).drop_duplicates().itertuples(index=False)
+    checked = 0
+    for home, away in pairs:
+        row = table["matrix"][pair_position(table, home, away)]
+        np.testing.assert_allclose(row, scan_features(matches, model, home, away), rtol=1e-6, equal_nan=True)
+        checked += 1
+    assert checked == len(table["keys"])
+    assert table["matrix"].dtype == np.float32
+    assert list(table["columns"]) == list(model.feature_names_in_)
+
+def test_lookup_by_name_alias_or_id(matches, metadata, model):
+    table = build_feature_table(matches, model, get_column_names, "v2", metadata)
+    home, away = metadata["team_ids"]["FC Copenhagen"], metadata["team_ids"]["Brondby"]
+    position = pair_position(table, "FC Copenhagen", "Brondby")
+    assert position is not None
+    assert pair_position(table, "copenhagen", "Brøndby") == pair_position(table, home, away) == position
+    assert pair_position(table, "Nobody", "Brondby") is None
+    assert pair_position(table, "Nobody", "Brondby", -1) == -1
+    frame = feature_frame(table, "FC Copenhagen", "Brondby")
+    scan = compute_mean_for_teams("FC Copenhagen", "Brondby", matches, model, get_column_names, version="v2")
+    np.testing.assert_allclose(frame.to_numpy(float), scan.to_numpy(float), rtol=1e-6, equal_nan=True)
+
+def test_incremental_update_matches_full_build(matches, metadata, model):
+    full = build_feature_table(matches, model, get_column_names, "v2", metadata)
+    split = len(matches) // 2
+    half = build_feature_table(matches.iloc[:split], model, get_column_names, "v2", metadata)
+    update_feature_table(half, matches.iloc[split:], get_column_names)
+    assert len(half["keys"]) == len(full["keys"])
+    for pair, position in full["keys"].items():
+        np.testing.assert_allclose(half["matrix"][half["keys"][pair]], full["matrix"][position],
+                                   rtol=1e-6, equal_nan=True)
+    np.testing.assert_array_equal(half["counts"][[half["keys"][p] for p in full["keys"]]], full["counts"])
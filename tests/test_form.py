@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+from collections import defaultdict
+import pytest
+from conftest import chronological
+from analytics import get_column_names, get_head_to_head_form, get_team_recent_form
+from form import (FORM_SIZE, build_form_state, head_to_head_form, home_away_form, match_outcome,
+                  new_form_state, record_result, team_form)
+
+def reference_form(data):
+    """Every team's outcomes, every pair's and the home/away results, in
+    date order, from a plain pass over the rows."""
+    teams, pairs, home, away = defaultdict(list), defaultdict(list), defaultdict(list), defaultdict(list)
+    for h, a, result, _ in chronological(data):
+        teams[h].append(match_outcome(result, True))
+        teams[a].append(match_outcome(result, False))
+        pairs[frozenset((h, a))].append({h: match_outcome(result, True), a: match_outcome(result, False)})
+        home[h].append(result if isinstance(result, str) else "-")
+        away[a].append(result if isinstance(result, str) else "-")
+    return teams, pairs, home, away
+
+def last(items, n=FORM_SIZE):
+    return "".join(reversed(items[-n:]))
+
+@pytest.fixture(scope="module")
+def state(matches, metadata):
+    return build_form_state(matches, get_column_names, metadata=metadata)
+
+def test_team_and_home_away_form(matches, state):
+    teams, _, home, away = reference_form(matches)
+    for team in teams:
+        assert team_form(state, "v2", team) == last(teams[team])
+        assert home_away_form(state, "v2", team, team) == (last(home[team]), last(away[team]))
+        # The unindexed scan path in analytics agrees as well.
+        assert get_team_recent_form(team, matches, "v2") == last(teams[team])
+
+def test_head_to_head_form(matches, state):
+    _, pairs, _, _ = reference_form(matches)
+    for pair, meetings in pairs.items():
+        a, b = sorted(pair)
+        expected = (last([m[a] for m in meetings]), last([m[b] for m in meetings]))
+        assert head_to_head_form(state, "v2", a, b) == expected
+        assert head_to_head_form(state, "v2", b, a) == expected[::-1]
+        assert get_head_to_head_form(a, b, matches, "v2") == expected
+
+def test_keys_are_team_ids_and_names_resolve(state, metadata):
+    copenhagen = metadata["team_ids"]["FC Copenhagen"]
+    assert ("v2", copenhagen) in state["teams"]
+    assert all(isinstance(team, int) for _, team in state["teams"])
+    assert team_form(state, "v2", "copenhagen") == team_form(state, "v2", copenhagen) != ""
+    assert team_form(state, "v2", "Nobody") == ""
+    assert team_form(state, "v1", "FC Copenhagen") == ""
+
+def test_record_result_keeps_the_last_n(metadata):
+    state = new_form_state(size=3, metadata=metadata)
+    for result in "HHDAA":
+        record_result(state, "v2", "FC Copenhagen", "Brondby", result)
+    assert team_form(state, "v2", "FC Copenhagen") == "LLD"
+    assert team_form(state, "v2", "Brondby") == "WWD"
+    assert home_away_form(state, "v2", "FC Copenhagen", "Brondby") == ("AAD", "AAD")
+    assert head_to_head_form(state, "v2", "Brondby", "copenhagen") == ("WWD", "LLD")
+    # A team the metadata does not know is kept under its name.
+    record_result(state, "v2", "Newcomers", "Brondby", "H")
+    assert team_form(state, "v2", "Newcomers") == "W"
+    assert head_to_head_form(state, "v2", "Newcomers", "Brondby") == ("W", "L")
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import logging
+import pytest
+from analytics import get_column_names
+from conftest import MATCHES_CSV, MATCHES_V1_CSV
+from data_loader import ingest_csv, required_columns
+from matchup_index import build_matchup_index, team_positions
+from metadata import (DATA_CATEGORY, build_metadata, canonical_name, league_teams, league_version, normalize,
+                      resolve_team)
+
+@pytest.fixture(scope="module")
+def listed(matches):
+    """A leagues.py-style listing: Denmark with a feed's spellings and one
+    club the data does not have, and a league with no data at all."""
+    latest = matches[(matches["League"] == "Superliga") & (matches["Season"] == "2023/2024")]
+    teams = sorted(set(latest["Home"].astype(object)) - {"FC Copenhagen", "Brondby"})
+    return {
+        "European Leagues": {"Premier League": ["Chelsea", "Arsenal"]},
+        "Others": {"Denmark League": teams + ["Copenhagen", "Brøndby", "Nobody FC"]},
+    }
+
+@pytest.fixture(scope="module")
+def meta(matches, listed):
+    return build_metadata(matches, get_column_names, leagues=listed)
+
+def test_ids_only_for_data_names(matches, meta):
+    data_names = set(matches["Home"].astype(object)) | set(matches["Away"].astype(object))
+    assert set(meta["names"]) == data_names
+    assert [meta["team_ids"][name] for name in meta["names"]] == list(range(len(meta["names"])))
+    assert "Nobody FC" not in meta["team_ids"] and "Chelsea" not in meta["team_ids"]
+
+def test_every_league_team_id_has_rows(matches, meta):
+    index = build_matchup_index(matches, get_column_names, metadata=meta)
+    for league, entry in meta["leagues"].items():
+        for team in entry["teams"]:
+            assert len(team_positions(index, entry["version"], team)), (league, meta["names"][team])
+
+def test_listed_names_resolve_through_aliases(meta):
+    teams = league_teams(meta, "Denmark League")
+    assert len(teams) == len(set(teams)) == 12
+    assert "FC Copenhagen" in teams and "Brondby" in teams
+    assert "Copenhagen" not in teams and "Brøndby" not in teams and "Nobody FC" not in teams
+    entry = meta["leagues"]["Denmark League"]
+    assert (entry["source"], entry["version"], entry["category"]) == ("Denmark Superliga", "v2", "Others")
+
+def test_unresolved_names_are_logged(matches, listed, caplog):
+    with caplog.at_level(logging.INFO):
+        build_metadata(matches, get_column_names, leagues=listed)
+    warnings = [r.getMessage() for r in caplog.records if r.levelno == logging.WARNING]
+    assert len(warnings) == 1 and "Denmark League" in warnings[0] and "Nobody FC" in warnings[0]
+    assert any("Premier League" in r.getMessage() for r in caplog.records if r.levelno == logging.INFO)
+
+def test_league_without_data_keeps_its_listed_names(meta):
+    entry = meta["leagues"]["Premier League"]
+    assert entry["source"] is None and entry["teams"] == []
+    assert league_version(meta, "Premier League") == "v1"
+    assert league_teams(meta, "Premier League") == ["Arsenal", "Chelsea"]
+
+def test_unlisted_data_leagues_are_added(matches, meta):
+    assert "Switzerland Super League" in meta["categories"][DATA_CATEGORY]
+    entry = meta["leagues"]["Switzerland Super League"]
+    assert entry["version"] == "v2" and list(entry["seasons"]) == ["2023/2024"]
+    swiss = matches[matches["Country"] == "Switzerland"]
+    assert league_teams(meta, "Switzerland Super League") == sorted(set(swiss["Home"].astype(object)))
+
+def test_seasons(meta):
+    assert set(meta["leagues"]["Denmark League"]["seasons"]) == {"2022/2023", "2023/2024"}
+    assert len(league_teams(meta, "Denmark League", "2022/2023")) == 12
+    assert league_teams(meta, "Denmark League", "1999/2000") == []
+
+def test_resolve_team(meta):
+    copenhagen = meta["team_ids"]["FC Copenhagen"]
+    for name in ("FC Copenhagen", "fc copenhagen", "Copenhagen", "FC København", copenhagen):
+        assert resolve_team(meta, name) == copenhagen
+    assert resolve_team(meta, "Brøndby") == meta["team_ids"]["Brondby"]
+    assert resolve_team(meta, "Nobody FC") is None
+    assert resolve_team(meta, len(meta["names"])) is None
+    assert resolve_team(None, "FC Copenhagen") is None
+    assert canonical_name(meta, "COPENHAGEN") == "FC Copenhagen"
+    assert canonical_name(meta, "Nobody FC") == "Nobody FC"
+    assert normalize("Brøndby IF") == normalize("brondby if") == "brondbyif"
+
+def test_v1_rows_get_seasons_from_their_dates(combined):
+    meta = build_metadata(combined, get_column_names, leagues={"European Leagues": {"Premier League": [
+        "Arsenal", "Chelsea", "Everton", "Liverpool", "Manchester United", "Spurs", "Wolves"]}})
+    entry = meta["leagues"]["Premier League"]
+    assert (entry["source"], entry["version"]) == ("E0", "v1")
+    assert set(entry["seasons"]) == {"2022/2023", "2023/2024"}
+    assert league_teams(meta, "Premier League") == ["Arsenal", "Chelsea", "Everton", "Liverpool", "Man United",
+                                                    "Tottenham"]
+    assert set(meta["leagues"]["Switzerland Super League"]["seasons"]) == {"2023/2024"}
+
+def test_serving_projection_keeps_the_league_columns(combined):
+    projected = ingest_csv([MATCHES_V1_CSV, MATCHES_CSV], columns=required_columns())
+    served = build_metadata(projected, get_column_names)
+    assert served["leagues"] == build_metadata(combined, get_column_names)["leagues"]
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import chronological
+from analytics import get_column_names
+from form import match_outcome
+from outcomes import (build_outcome_engine, head_to_head_summary, league_form, league_table, team_matches,
+                      team_summary)
+
+LETTER_POINTS = {"W": 3, "D": 1, "L": 0}
+
+@pytest.fixture(scope="module")
+def engine(matches, metadata):
+    return build_outcome_engine(matches, get_column_names, metadata=metadata)
+
+@pytest.fixture(scope="module")
+def history(matches):
+    """Per team, its matches oldest first as (date, outcome letter, goals
+    for, goals against, opponent), from a plain pass over the rows."""
+    goals = dict(zip(zip(matches["Home"].astype(object), matches["Away"].astype(object), matches["Date"]),
+                     zip(matches["HG"], matches["AG"])))
+    teams = defaultdict(list)
+    for home, away, result, date in chronological(matches):
+        hg, ag = goals[(home, away, date)]
+        teams[home].append((date, match_outcome(result, True), hg, ag, away))
+        teams[away].append((date, match_outcome(result, False), ag, hg, home))
+    return teams
+
+def test_team_groups_are_chronological(engine, metadata, history):
+    table = engine["v2"]
+    for team, entries in history.items():
+        positions = team_matches(engine, "v2", team)
+        dates = table["dates"][table["team_match"][positions]]
+        assert list(pd.DatetimeIndex(dates)) == [e[0] for e in entries]
+        assert (table["team"][positions] == metadata["team_ids"][team]).all()
+
+def test_team_form_and_summary(engine, history):
+    forms = league_form(engine, "v2", list(history))
+    for team, entries in history.items():
+        letters = "".join(e[1] for e in entries)
+        assert forms[team] == letters[-5:][::-1]
+        summary = team_summary(engine, "v2", team, last=10)
+        recent = entries[-10:]
+        assert summary["played"] == len(recent)
+        assert (summary["won"], summary["drawn"], summary["lost"]) == tuple(
+            sum(e[1] == x for e in recent) for x in "WDL")
+        assert summary["goals_for"] == pytest.approx(np.mean([e[2] for e in recent]))
+        assert summary["goals_against"] == pytest.approx(np.mean([e[3] for e in recent]))
+
+def test_head_to_head(engine, history):
+    for team, entries in history.items():
+        for opponent in {e[4] for e in entries}:
+            meetings = [e for e in entries if e[4] == opponent]
+            letters = "".join(e[1] for e in meetings)
+            summary = head_to_head_summary(engine, "v2", team, opponent)
+            assert summary["played"] == len(meetings)
+            assert summary["won"] == letters.count("W")
+            assert summary["goals_for"] == pytest.approx(np.mean([e[2] for e in meetings]))
+
+@pytest.mark.parametrize("since, last", [(None, None), ("2023-07-01", None), (None, 6), ("2023-01-01", 4)])
+def test_league_table(engine, history, metadata, since, last):
+    teams = [metadata["names"][i] for i in metadata["leagues"]["Denmark League"]["teams"]]
+    table = league_table(engine, "v2", teams + ["Nobody"], since=since, last=last).set_index("team")
+    for team in teams:
+        entries = [e for e in history[team] if since is None or e[0] >= pd.Timestamp(since)]
+        entries = entries[-last:] if last else entries
+        row = table.loc[team]
+        assert row["played"] == len(entries)
+        assert row["points"] == sum(LETTER_POINTS[e[1]] for e in entries)
+        assert row["goals_for"] == sum(e[2] for e in entries)
+        assert row["goal_diff"] == sum(e[2] - e[3] for e in entries)
+        form = [e for e in history[team] if since is None or e[0] >= pd.Timestamp(since)]
+        assert row["form"] == "".join(e[1] for e in form[-5:])[::-1]
+    assert table.loc["Nobody", "played"] == 0
+    assert list(table["points"]) == sorted(table["points"], reverse=True)
+
+def test_lookups_take_ids_and_aliases(engine, metadata):
+    copenhagen = metadata["team_ids"]["FC Copenhagen"]
+    forms = league_form(engine, "v2", [copenhagen, "copenhagen", "Nobody"])
+    assert forms[copenhagen] == forms["copenhagen"] != "" and forms["Nobody"] == ""
+    assert league_form(engine, "v1", ["FC Copenhagen"]) == {"FC Copenhagen": ""}
+    assert len(team_matches(engine, "v2", copenhagen)) == len(team_matches(engine, "v2", "copenhagen")) > 0
+
+@pytest.mark.parametrize("last", [0, -1])
+def test_league_table_rejects_last_below_one(engine, last):
+    with pytest.raises(ValueError):
+        league_table(engine, "v2", ["FC Copenhagen"], last=last)
+
+@pytest.mark.parametrize("last", [0, -3])
+def test_summaries_reject_last_below_one(engine, last):
+    with pytest.raises(ValueError):
+        team_summary(engine, "v2", "FC Copenhagen", last=last)
+    with pytest.raises(ValueError):
+        head_to_head_summary(engine, "v2", "FC Copenhagen", "Brondby", last=last)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import joblib
+import pytest
+from conftest import MATCHES_CSV
+from model_registry import forget_model
+from store import DATA, PREDICTIONS, Store
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch, model):
+    """A directory with the test slice as the dataset and the test model as
+    both model files; the registry starts and ends empty."""
+    shutil.copyfile(MATCHES_CSV, tmp_path / "matches.csv")
+    for path in ("model1.pkl", "model2.pkl"):
+        joblib.dump(model, tmp_path / path)
+    monkeypatch.chdir(tmp_path)
+    for name in ("v1", "v2"):
+        forget_model(name)
+    yield tmp_path
+    for name in ("v1", "v2"):
+        forget_model(name)
+
+def replace_model(path, model):
+    stat = os.stat(path)
+    joblib.dump(model, path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+def test_stale_snapshot_does_not_load_a_replaced_model(workdir, model):
+    store = Store(paths=["matches.csv"], poll_seconds=0)
+    first = store.snapshot()
+    assert first["models"] == {}
+    replace_model("model1.pkl", model)
+    with pytest.raises(RuntimeError):
+        store.model(first, "v1")
+
+    second = store.refresh()
+    assert second is not first
+    assert set(second["models"]) == {"v1", "v2"}
+    assert second["data"] is first["data"]
+    assert store.model(second, "v1") is second["models"]["v1"]
+
+def test_dependency_keys_follow_their_files(workdir, model):
+    store = Store(paths=["matches.csv"], poll_seconds=0)
+    first = store.snapshot()
+    replace_model("model1.pkl", model)
+    second = store.refresh()
+    key = store.dependency_key
+    assert key(second, DATA) == key(first, DATA)
+    assert key(second, PREDICTIONS) == key(first, PREDICTIONS)
+    assert key(second, ("model", "v2")) == key(first, ("model", "v2"))
+    assert key(second, ("model", "v1")) != key(first, ("model", "v1"))
+
+    with open("matches.csv") as f:
+        last_line = f.readlines()[-1]
+    with open("matches.csv", "a") as f:
+        f.write(last_line)
+    third = store.refresh()
+    assert len(third["data"]) == len(second["data"]) + 1
+    assert key(third, DATA) != key(second, DATA)
+    assert key(third, ("model", "v1")) == key(second, ("model", "v1"))
+    assert third["models"]["v2"] is second["models"]["v2"]
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+from tree_engine import check_model, compile_model, load_compiled, probe_matrix, save_compiled
+
+def test_compiled_model_matches_and_round_trips(model, tmp_path):
+    engine = compile_model(model)
+    check_model(engine, model, probe_matrix(engine))
+    save_compiled(engine, tmp_path / "engine.npz")
+    loaded = load_compiled(tmp_path / "engine.npz")
+    X = probe_matrix(engine, seed=1)
+    np.testing.assert_array_equal(loaded.predict_proba(X), engine.predict_proba(X))
+
+@pytest.mark.parametrize("kind", ["tree", "forest"])
+def test_trees_fitted_with_missing_values(kind):
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.tree import DecisionTreeClassifier
+    # A missing first feature decides the class, so the fitted trees split
+    # missing values off at an infinite threshold.
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 3))
+    X[rng.random(X.shape) < 0.2] = np.nan
+    y = np.where(np.isnan(X[:, 0]), 2, (X[:, 1] > 0) + 1)
+    estimator = (DecisionTreeClassifier(random_state=0) if kind == "tree"
+                 else RandomForestClassifier(n_estimators=10, random_state=0))
+    fitted = estimator.fit(X, y)
+    engine = compile_model(fitted)
+    assert np.isinf(engine.threshold).any()
+    probes = probe_matrix(engine)
+    assert not np.isinf(probes).any() and np.isnan(probes).any()
+    check_model(engine, fitted, probes)
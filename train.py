@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""train.py
+
+Rebuild the prediction models from the match data (replaces the Colab
+notebook).
+
+    python train.py --version v2
+    python train.py --version v2 --models hgb,xgb --n-iter 40 --jobs 8 --install
+
+Each training row is a match and its features are what the app feeds the
+model for that fixture: the means of the pair's earlier meetings
+(backtest.prior_history, the same numbers feature_table and
+compute_mean_for_teams produce), with H/D/A as 1/2/3. The feature matrix is
+cached under CACHE_DIR keyed by the dataset version, so re-runs with other
+search settings skip building it.
+
+The last TEST_FRACTION of matches by date is held out. Every candidate is
+tuned with RandomizedSearchCV over time-ordered folds (n_jobs bounded by
+--jobs, estimators single-threaded) with early stopping where the estimator
+has it, and the one with the best cross-validated log-loss is written to
+ARTIFACT_DIR as <version>-<timestamp>-<name>.pkl next to a .json with its
+features, parameters and scores. --install also copies it over the served
+model file and records its size, hash and features in manifest.json, so a
+later fetch neither rejects nor reverts it.
+
+Sklearn's GradientBoostingClassifier rejects NaN, and the odds columns are
+missing for whole seasons, so the boosted candidate is
+HistGradientBoostingClassifier. XGBoost predicts 0-based class indices, so
+an XGBoost winner is stored as its tree_engine compilation with the app's
+1/2/3 classes.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+import joblib
+import sklearn
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.metrics import accuracy_score, log_loss
+from sklearn.model_selection import RandomizedSearchCV, TimeSeriesSplit
+from sklearn.tree import DecisionTreeClassifier
+from analytics import get_column_names
+from backtest import prior_history
+from batch import RESULT_CODES
+from constants import CACHE_DIR, MODEL_FILES
+from data_loader import load_dataset
+from fetch import update_manifest
+from feature_table import source_columns
+from tree_engine import check_model, compile_model, probe_matrix
+
+try:
+    from xgboost import XGBClassifier
+except ImportError:
+    XGBClassifier = None
+
+ARTIFACT_DIR = "artifacts"
+FEATURE_FORMAT = 1
+TEST_FRACTION = 0.2
+VALIDATION_FRACTION = 0.1
+MAX_MISSING = 0.5
+CV_SPLITS = 3
+TARGET_CODES = {code: i + 1 for i, code in enumerate(RESULT_CODES)}
+
+def _dt(seed):
+    return DecisionTreeClassifier(random_state=seed), {
+        "max_depth": [3, 4, 5, 6, 8, 10, None],
+        "min_samples_leaf": [5, 10, 20, 40, 80],
+        "criterion": ["gini", "entropy", "log_loss"],
+        "class_weight": [None, "balanced"],
+    }
+
+def _rf(seed):
+    return RandomForestClassifier(random_state=seed, n_jobs=1), {
+        "n_estimators": [100, 200],
+        "max_depth": [5, 7, 10],
+        "min_samples_split": [15, 20, 30],
+        "min_samples_leaf": [5, 10, 15],
+        "max_features": [0.3, 0.5, "sqrt"],
+        "max_samples": [0.7, 0.8],
+    }
+
+def _hgb(seed):
+    return HistGradientBoostingClassifier(random_state=seed, max_iter=500, early_stopping=True,
+                                          validation_fraction=VALIDATION_FRACTION, n_iter_no_change=20), {
+        "learning_rate": [0.01, 0.03, 0.05, 0.1],
+        "max_depth": [3, 4, 5, None],
+        "max_leaf_nodes": [7, 15, 31],
+        "min_samples_leaf": [20, 40, 80],
+        "l2_regularization": [0.0, 0.1, 1.0],
+        "max_features": [0.5, 0.8, 1.0],
+    }
+
+def _xgb(seed):
+    return XGBClassifier(random_state=seed, n_jobs=1, n_estimators=1000, early_stopping_rounds=30,
+                         objective="multi:softprob", eval_metric="mlogloss"), {
+        "learning_rate": [0.01, 0.03, 0.05, 0.1],
+        "max_depth": [3, 4, 5, 6],
+        "subsample": [0.7, 0.8, 0.9],
+        "colsample_bytree": [0.6, 0.8, 1.0],
+        "min_child_weight": [1, 5, 10],
+        "reg_alpha": [0.0, 0.1, 1.0],
+        "reg_lambda": [1.0, 5.0],
+    }
+
+CANDIDATES = {"dt": _dt, "rf": _rf, "hgb": _hgb, "xgb": _xgb}
+
+def feature_columns(data, version, max_missing=MAX_MISSING):
+    home_col, _, result_col = get_column_names(version)
+    candidates = [c for c in data.columns if c not in (result_col, "Version")]
+    rows = data[data[home_col].notna()]
+    return [c for c in source_columns(rows, candidates) if rows[c].isna().mean() <= max_missing]
+
+def _cache_path(data, version, columns, cache_dir):
+    key = json.dumps([FEATURE_FORMAT, data.attrs.get("data_version"), version, columns])
+    return os.path.join(cache_dir, "train", f"{version}-{hashlib.sha256(key.encode()).hexdigest()[:12]}.npz")
+
+def build_training_set(data, version, cache_dir=CACHE_DIR, max_missing=MAX_MISSING):
+    """Rows with at least one earlier meeting, sorted by date: X (prior
+    means, float32), y (1/2/3) and the match dates."""
+    columns = feature_columns(data, version, max_missing)
+    path = _cache_path(data, version, columns, cache_dir)
+    if data.attrs.get("data_version") and os.path.exists(path):
+        with np.load(path) as cached:
+            logging.info(f"Training features for {version} loaded from {path}")
+            return {"columns": columns, "X": cached["X"], "y": cached["y"], "dates": cached["dates"]}
+
+    start = time.perf_counter()
+    result_col = get_column_names(version)[2]
+    positions, means, _, totals = prior_history(data, version, columns)
+    rows = data.take(positions)
+    y = rows[result_col].astype(object).map(TARGET_CODES).to_numpy(dtype=np.float64)
+    keep = (totals > 0) & ~np.isnan(y)
+    dates = rows["Date"].to_numpy()[keep]
+    order = np.argsort(dates, kind="stable")
+    training = {
+        "columns": columns,
+        "X": means[keep][order],
+        "y": y[keep][order].astype(np.int8),
+        "dates": dates[order].astype("datetime64[ns]"),
+    }
+    logging.info(f"Built {len(training['y'])} x {len(columns)} training features for {version} "
+                 f"in {time.perf_counter() - start:.1f}s")
+    if data.attrs.get("data_version"):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, X=training["X"], y=training["y"], dates=training["dates"])
+        os.replace(tmp, path)
+    return training
+
+def evaluate(model, X, y):
+    proba = model.predict_proba(X)
+    return {
+        "accuracy": float(accuracy_score(y, model.predict(X))),
+        "log_loss": float(log_loss(y, proba, labels=model.classes_)),
+        "rows": int(len(y)),
+    }
+
+def search(name, X, y, n_iter, jobs, seed):
+    """Tune one candidate on the training window minus its most recent
+    VALIDATION_FRACTION, which is kept back as XGBoost's early-stopping set.
+    Every candidate is cross-validated on the same rows and folds, so their
+    CV log-losses compare."""
+    estimator, space = CANDIDATES[name](seed)
+    split = int(len(y) * (1 - VALIDATION_FRACTION))
+    fit_params = {}
+    if name == "xgb":
+        # XGBoost wants 0-based labels (relabelling the classes does not
+        # change the log-loss) and no "<" or "[" in feature names, hence
+        # plain arrays.
+        X = X.to_numpy()
+        fit_params = {"eval_set": [(X[split:], y[split:] - 1)], "verbose": False}
+        y = y - 1
+    X, y = X[:split], y[:split]
+    searcher = RandomizedSearchCV(estimator, space, n_iter=n_iter, scoring="neg_log_loss",
+                                  cv=TimeSeriesSplit(CV_SPLITS), n_jobs=jobs, random_state=seed,
+                                  error_score="raise")
+    searcher.fit(X, y, **fit_params)
+    return searcher
+
+def servable(name, model, X):
+    if name != "xgb":
+        return model
+    engine = compile_model(model)
+    check_model(engine, model, np.vstack([probe_matrix(engine), X.to_numpy(dtype=np.float32)[:1000]]))
+    engine.classes_ = np.array([1, 2, 3])
+    engine.meta["features"] = list(X.columns)
+    engine.feature_names_in_ = np.array(X.columns, dtype=object)
+    return engine
+
+def train(version="v2", names=("dt", "rf", "hgb", "xgb"), n_iter=20, jobs=None, seed=1,
+          data=None, cache_dir=CACHE_DIR):
+    data = load_dataset() if data is None else data
+    training = build_training_set(data, version, cache_dir)
+    X = pd.DataFrame(training["X"], columns=training["columns"])
+    y = training["y"]
+    split = int(len(y) * (1 - TEST_FRACTION))
+    jobs = jobs or min(4, os.cpu_count() or 1)
+
+    results = {}
+    for name in names:
+        if name == "xgb" and XGBClassifier is None:
+            logging.warning("xgboost is not installed, skipping the xgb candidate")
+            continue
+        start = time.perf_counter()
+        searcher = search(name, X.iloc[:split], y[:split], n_iter, jobs, seed)
+        model = servable(name, searcher.best_estimator_, X.iloc[:split])
+        results[name] = {
+            "model": model,
+            "params": searcher.best_params_,
+            "cv_log_loss": float(-searcher.best_score_),
+            "train": evaluate(model, X.iloc[:split], y[:split]),
+            "test": evaluate(model, X.iloc[split:], y[split:]),
+            "seconds": time.perf_counter() - start,
+        }
+        logging.info(f"{version}/{name}: cv log-loss {results[name]['cv_log_loss']:.4f}, "
+                     f"test accuracy {results[name]['test']['accuracy']:.3f} "
+                     f"({results[name]['seconds']:.1f}s)")
+    if not results:
+        raise ValueError("No candidate models were trained")
+
+    best = min(results, key=lambda n: results[n]["cv_log_loss"])
+    meta = {
+        "version": version,
+        "estimator": best,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "data_version": data.attrs.get("data_version"),
+        "features": list(training["columns"]),
+        "train_period": [str(training["dates"][0])[:10], str(training["dates"][split - 1])[:10]],
+        "test_period": [str(training["dates"][split])[:10], str(training["dates"][-1])[:10]],
+        "candidates": {n: {k: v for k, v in r.items() if k != "model"} for n, r in results.items()},
+        "libraries": {"sklearn": sklearn.__version__, "numpy": np.__version__, "pandas": pd.__version__},
+    }
+    return results[best]["model"], meta
+
+def save_artifact(model, meta, out_dir=ARTIFACT_DIR):
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = meta["created"].replace("-", "").replace(":", "")
+    stem = os.path.join(out_dir, f"{meta['version']}-{stamp}-{meta['estimator']}")
+    joblib.dump(model, f"{stem}.pkl")
+    with open(f"{stem}.json", "w") as f:
+        json.dump(meta, f, indent=2, default=str)
+    return f"{stem}.pkl"
+
+def install(path, version):
+    target = MODEL_FILES[version]
+    tmp = f"{target}.tmp"
+    shutil.copyfile(path, tmp)
+    os.replace(tmp, target)
+    update_manifest(paths=[target])
+    return target
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the prediction models")
+    parser.add_argument("--version", choices=list(MODEL_FILES), default="v2")
+    parser.add_argument("--models", default=",".join(CANDIDATES), help="comma-separated: " + ", ".join(CANDIDATES))
+    parser.add_argument("--n-iter", type=int, default=20, help="parameter settings sampled per model")
+    parser.add_argument("--jobs", type=int, help="parallel search fits (defaults to min(4, CPUs))")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("-o", "--output-dir", default=ARTIFACT_DIR)
+    parser.add_argument("--install", action="store_true", help="copy the winner over the served model file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    model, meta = train(args.version, args.models.split(","), args.n_iter, args.jobs, args.seed)
+    path = save_artifact(model, meta, args.output_dir)
+    logging.info(f"Saved {meta['estimator']} to {path}")
+    json.dump({"artifact": path, **meta["candidates"][meta["estimator"]]}, sys.stdout, indent=2, default=str)
+    print()
+    if args.install:
+        logging.info(f"Installed {path} as {install(path, args.version)}")
+
+if __name__ == "__main__":
+    main()
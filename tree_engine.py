@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""tree_engine.py
+
+Array-based inference for the tree models. compile_model() flattens a fitted
+sklearn DecisionTree / RandomForest / ExtraTrees / GradientBoosting /
+HistGradientBoosting classifier or an XGBoost XGBClassifier into flat node
+arrays (feature, threshold, children, missing-value direction, leaf values)
+and evaluates whole batches with vectorised NumPy on float32 matrices: every
+tree of the ensemble walks one level per step, so the cost is depth x batch
+regardless of tree count.
+
+The result is a drop-in stand-in for the estimator (predict, predict_proba,
+classes_, feature_names_in_) that can be saved to .npz and loaded again
+without importing sklearn or xgboost.
+
+    engine = compile_model(model)
+    check_model(engine, model, probe_matrix(engine))
+    engine.predict_proba(X)
+"""
+
+import json
+import numpy as np
+
+ENGINE_FORMAT = 1
+
+def _softmax(raw):
+    raw = raw - raw.max(axis=1, keepdims=True)
+    exp = np.exp(raw)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+def _sigmoid(raw):
+    return 1.0 / (1.0 + np.exp(-raw))
+
+class CompiledModel:
+    def __init__(self, arrays, meta):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.missing_left = arrays["missing_left"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.bias = arrays["bias"]
+        self.classes_ = arrays["classes"]
+        self.meta = meta
+        self.feature_names_in_ = np.array(meta["features"], dtype=object)
+        self.n_features_in_ = len(meta["features"])
+
+    def __repr__(self):
+        return f"CompiledModel({self.meta['source']}, {len(self.roots)} trees, depth {self.meta['depth']})"
+
+    def as_matrix(self, X):
+        if hasattr(X, "columns"):
+            if list(X.columns) != self.meta["features"]:
+                X = X.reindex(columns=self.meta["features"], fill_value=0)
+            return X.to_numpy(dtype=np.float32, na_value=np.nan)
+        return np.asarray(X, dtype=np.float32).reshape(-1, self.n_features_in_)
+
+    def apply(self, X):
+        """Leaf index reached in every tree: (n_samples, n_trees)."""
+        X = self.as_matrix(X)
+        rows = np.arange(len(X))[:, np.newaxis]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        # Leaves point at themselves, so walking the full depth is branch-free.
+        for _ in range(self.meta["depth"]):
+            x = X[rows, self.feature[node]]
+            if self.meta["strict"]:
+                go_left = x < self.threshold[node]
+            else:
+                go_left = x <= self.threshold[node]
+            go_left = np.where(np.isnan(x), self.missing_left[node], go_left)
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def decision_function(self, X):
+        raw = self.value[self.apply(X)].sum(axis=1)
+        if self.meta["link"] == "mean":
+            return raw / len(self.roots)
+        return raw + self.bias
+
+    def predict_proba(self, X):
+        raw = self.decision_function(X)
+        link = self.meta["link"]
+        if link == "mean":
+            return raw
+        if link == "softmax":
+            return _softmax(raw)
+        p = _sigmoid(raw[:, 0])
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+def _assemble(trees, classes, features, link, strict, bias, source):
+    """trees: list of (feature, threshold, left, right, missing_left, value)
+    per tree with tree-local child indices and -1 children at leaves."""
+    offset = 0
+    roots, parts = [], []
+    depth = 0
+    for feature, threshold, left, right, missing_left, value in trees:
+        n = len(feature)
+        ids = np.arange(n) + offset
+        leaf = left < 0
+        left = np.where(leaf, ids, left + offset)
+        right = np.where(leaf, ids, right + offset)
+        feature = np.where(leaf, 0, feature)
+        parts.append((feature, threshold, left, right, missing_left, value))
+        roots.append(offset)
+        depth = max(depth, _tree_depth(left - offset, right - offset, leaf))
+        offset += n
+    arrays = {
+        "feature": np.concatenate([p[0] for p in parts]).astype(np.int32),
+        "threshold": np.concatenate([p[1] for p in parts]),
+        "left": np.concatenate([p[2] for p in parts]).astype(np.int32),
+        "right": np.concatenate([p[3] for p in parts]).astype(np.int32),
+        "missing_left": np.concatenate([p[4] for p in parts]).astype(bool),
+        "value": np.concatenate([p[5] for p in parts]).astype(np.float64),
+        "roots": np.array(roots, dtype=np.int32),
+        "bias": np.asarray(bias, dtype=np.float64),
+        "classes": np.asarray(classes),
+    }
+    meta = {
+        "format": ENGINE_FORMAT,
+        "source": source,
+        "features": [str(f) for f in features],
+        "link": link,
+        "strict": strict,
+        "depth": depth,
+        "missing": True,
+    }
+    return CompiledModel(arrays, meta)
+
+def _tree_depth(left, right, leaf):
+    depth, level = 0, np.array([0])
+    while True:
+        level = level[~leaf[level]]
+        if not len(level):
+            return depth
+        level = np.concatenate([left[level], right[level]])
+        depth += 1
+
+def _sklearn_tree(tree, value):
+    return (tree.feature, tree.threshold, tree.children_left, tree.children_right,
+            getattr(tree, "missing_go_to_left", np.zeros(tree.node_count, dtype=bool)), value)
+
+def _class_probabilities(tree):
+    value = tree.value[:, 0, :].astype(np.float64)
+    totals = value.sum(axis=1, keepdims=True)
+    return value / np.where(totals == 0, 1.0, totals)
+
+def _feature_names(model):
+    names = getattr(model, "feature_names_in_", None)
+    if names is None:
+        names = [f"x{i}" for i in range(model.n_features_in_)]
+    return list(names)
+
+def _compile_sklearn(model):
+    name = type(model).__name__
+    if name == "DecisionTreeClassifier":
+        estimators = [model]
+    elif name in ("RandomForestClassifier", "ExtraTreesClassifier"):
+        estimators = list(model.estimators_)
+    elif name == "GradientBoostingClassifier":
+        return _compile_gradient_boosting(model)
+    elif name == "HistGradientBoostingClassifier":
+        return _compile_hist_gradient_boosting(model)
+    else:
+        raise ValueError(f"Cannot compile {name}")
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise ValueError(f"Cannot compile multi-output {name}")
+    trees = [_sklearn_tree(e.tree_, _class_probabilities(e.tree_)) for e in estimators]
+    return _assemble(trees, model.classes_, _feature_names(model), "mean", False, 0.0, name)
+
+def _compile_gradient_boosting(model):
+    init = model.init_
+    if not (init == "zero" or type(init).__name__ == "DummyClassifier"):
+        raise ValueError(f"Cannot compile GradientBoostingClassifier with init={type(init).__name__}")
+    n_outputs = model.estimators_.shape[1]
+    # The init estimator predicts a constant, so its raw score is the bias for every row.
+    bias = model._raw_predict_init(np.zeros((1, model.n_features_in_), dtype=np.float32))[0]
+    trees = []
+    for stage in model.estimators_:
+        for k, estimator in enumerate(stage):
+            tree = estimator.tree_
+            value = np.zeros((tree.node_count, n_outputs))
+            value[:, k] = model.learning_rate * tree.value[:, 0, 0]
+            trees.append(_sklearn_tree(tree, value))
+    link = "sigmoid" if n_outputs == 1 else "softmax"
+    engine = _assemble(trees, model.classes_, _feature_names(model), link, False, bias,
+                       "GradientBoostingClassifier")
+    engine.meta["missing"] = False  # sklearn GB rejects NaN input outright
+    return engine
+
+def _compile_hist_gradient_boosting(model):
+    if getattr(model, "_preprocessor", None) is not None or getattr(model, "is_categorical_", None) is not None:
+        raise ValueError("Cannot compile HistGradientBoostingClassifier with categorical features")
+    n_outputs = model.n_trees_per_iteration_
+    trees = []
+    for iteration in model._predictors:
+        for k, predictor in enumerate(iteration):
+            nodes = predictor.nodes
+            leaf = nodes["is_leaf"].astype(bool)
+            value = np.zeros((len(nodes), n_outputs))
+            value[leaf, k] = nodes["value"][leaf]
+            trees.append((nodes["feature_idx"].astype(np.int64), nodes["num_threshold"],
+                          np.where(leaf, -1, nodes["left"].astype(np.int64)),
+                          np.where(leaf, -1, nodes["right"].astype(np.int64)),
+                          nodes["missing_go_to_left"].astype(bool), value))
+    link = "sigmoid" if n_outputs == 1 else "softmax"
+    return _assemble(trees, model.classes_, _feature_names(model), link, False,
+                     np.asarray(model._baseline_prediction, dtype=np.float64).ravel(),
+                     "HistGradientBoostingClassifier")
+
+def _compile_xgboost(model):
+    booster = model.get_booster()
+    config = json.loads(booster.save_raw("json"))
+    learner = config["learner"]
+    objective = learner["objective"]["name"]
+    if objective == "binary:logistic":
+        link, n_outputs = "sigmoid", 1
+    elif objective in ("multi:softprob", "multi:softmax"):
+        link, n_outputs = "softmax", int(learner["learner_model_param"]["num_class"])
+    else:
+        raise ValueError(f"Cannot compile XGBoost objective {objective}")
+    gbm = learner["gradient_booster"]
+    if gbm["name"] != "gbtree":
+        raise ValueError(f"Cannot compile XGBoost booster {gbm['name']}")
+    dumped = gbm["model"]["trees"]
+    tree_info = gbm["model"]["tree_info"]
+
+    n_trees = len(dumped)
+    best = getattr(model, "best_iteration", None)
+    if best is not None:
+        per_round = n_outputs * int(gbm["model"]["gbtree_model_param"].get("num_parallel_tree", 1))
+        n_trees = min(n_trees, (best + 1) * per_round)
+
+    trees = []
+    for tree, k in zip(dumped[:n_trees], tree_info[:n_trees]):
+        if tree.get("categories"):
+            raise ValueError("Cannot compile XGBoost categorical splits")
+        left = np.array(tree["left_children"])
+        conditions = np.array(tree["split_conditions"], dtype=np.float32)
+        value = np.zeros((len(left), n_outputs))
+        # Leaf weights are stored in split_conditions at leaf nodes.
+        value[left < 0, k] = conditions[left < 0]
+        trees.append((np.array(tree["split_indices"]), conditions, left, np.array(tree["right_children"]),
+                      np.array(tree["default_left"], dtype=bool), value))
+
+    engine = _assemble(trees, model.classes_, _feature_names(model), link, True, np.zeros(n_outputs), "XGBClassifier")
+    # base_score is stored differently across XGBoost versions; take the bias
+    # as whatever the booster adds on top of the tree sum for a probe row.
+    probe = np.zeros((1, engine.n_features_in_), dtype=np.float32)
+    margin = np.asarray(model.predict(probe, output_margin=True), dtype=np.float64).reshape(1, -1)
+    engine.bias = (margin - engine.decision_function(probe))[0]
+    return engine
+
+def compile_model(model):
+    if isinstance(model, CompiledModel):
+        return model
+    if hasattr(model, "get_booster"):
+        return _compile_xgboost(model)
+    return _compile_sklearn(model)
+
+def probe_matrix(engine, n=512, seed=0):
+    """Rows built from the engine's own split thresholds (just below, at
+    and just above each), with zeros and NaNs (where the model accepts them)
+    mixed in, so a check exercises both sides of the splits rather than
+    whichever paths real fixtures happen to take. Infinite thresholds are
+    left out: the estimators reject infinite inputs, and the NaN rows cover
+    those missing-value splits."""
+    rng = np.random.default_rng(seed)
+    X = np.zeros((n, engine.n_features_in_), dtype=np.float32)
+    internal = engine.left != np.arange(len(engine.left))
+    features = engine.feature[internal]
+    thresholds = engine.threshold[internal].astype(np.float32)
+    for f in np.unique(features):
+        cuts = thresholds[features == f]
+        cuts = cuts[np.isfinite(cuts)]
+        candidates = np.concatenate([cuts, np.nextafter(cuts, np.float32(-np.inf)),
+                                     np.nextafter(cuts, np.float32(np.inf)), [0.0]])
+        if engine.meta["missing"]:
+            candidates = np.append(candidates, np.nan)
+        X[:, f] = rng.choice(candidates.astype(np.float32), size=n)
+    return X
+
+def check_model(engine, model, X, atol=1e-6):
+    """Compare the engine with the original estimator on X; raises ValueError
+    if probabilities differ by more than atol or any predicted class differs."""
+    import pandas as pd
+    frame = X
+    if hasattr(model, "feature_names_in_"):
+        frame = pd.DataFrame(X, columns=list(engine.feature_names_in_)).astype(np.float32)
+    expected = model.predict_proba(frame)
+    got = engine.predict_proba(X)
+    error = float(np.max(np.abs(expected - got))) if len(X) else 0.0
+    mismatched = int((model.predict(frame) != engine.predict(X)).sum())
+    if error > atol or mismatched:
+        raise ValueError(f"Compiled {engine.meta['source']} disagrees with the model: "
+                         f"max |dp| {error:.3g}, {mismatched} differing predictions")
+    return error
+
+def save_compiled(engine, path, **extra):
+    arrays = {
+        "feature": engine.feature, "threshold": engine.threshold, "left": engine.left,
+        "right": engine.right, "missing_left": engine.missing_left, "value": engine.value,
+        "roots": engine.roots, "bias": engine.bias, "classes": engine.classes_,
+    }
+    meta = {**engine.meta, **extra}
+    np.savez(path, meta=np.array(json.dumps(meta)), **arrays)
+
+def load_compiled(path):
+    with np.load(path, allow_pickle=False) as f:
+        meta = json.loads(str(f["meta"]))
+        if meta.get("format") != ENGINE_FORMAT:
+            raise ValueError(f"{path} has engine format {meta.get('format')}, expected {ENGINE_FORMAT}")
+        return CompiledModel({k: f[k] for k in f.files if k != "meta"}, meta)
@@ -7,54 +7,110 @@ Original file is located at
     https://colab.research.google.com/drive/1w3luDBZ-0-wEnJvGrYQIjJqZCjNUoSUy
 """
 
+import os
+import numpy as np
+import pandas as pd
 import streamlit as st
-import plotly.express as px
+from cache import TTLCache
+from outcomes import RESULTS, encode_results
 
-def render_model_confidence(conf_dict):
+# Charts are built as plain figure dicts from small aggregates (no Plotly
+# Express, no copies of the match rows) and cached under the caller's key,
+# e.g. (version, home, away, data_version), so a repeated fixture reuses them.
+# VIEW_MODE=light draws the same aggregates with Streamlit's native charts and
+# skips Plotly altogether.
+VIEW_MODE = os.environ.get("VIEW_MODE", "plotly")
+VIEW_CACHE_SIZE = int(os.environ.get("VIEW_CACHE_SIZE", "1024"))
+RESULT_LABELS = {"H": "Home Win", "D": "Draw", "A": "Away Win"}
+# Hex, as st.bar_chart takes no colour names.
+COLORS = {"Home Win": "#2ca02c", "Draw": "#ffcc00", "Away Win": "#d62728",
+          "Home Team Win": "#2ca02c", "Away Team Win": "#d62728"}
+
+_payloads = TTLCache(VIEW_CACHE_SIZE)
+
+def cached(kind, key, build):
+    """build() once per (kind, key); key=None disables caching."""
+    if key is None:
+        return build()
+    value = _payloads.get((kind, key))
+    if value is None:
+        value = build()
+        _payloads.put((kind, key), value)
+    return value
+
+def head_to_head_payload(h2h):
+    """Meetings per year and result (the chart) and the newest-first
+    date/result list (the table), as JSON-ready lists."""
+    dates = h2h["Date"].to_numpy(dtype="datetime64[D]")
+    codes = encode_results(h2h["FTR" if "FTR" in h2h.columns else "Res"])
+    years = dates.astype("datetime64[Y]").astype(int) + 1970
+    known = (codes >= 0) & ~np.isnat(dates)
+    bins = np.unique(years[known])
+    slots = np.searchsorted(bins, years[known]) * len(RESULTS) + codes[known]
+    counts = np.bincount(slots, minlength=len(bins) * len(RESULTS)).reshape(len(bins), len(RESULTS))
+    order = np.argsort(dates, kind="stable")[::-1]
+    labels = np.array([RESULT_LABELS[r] for r in RESULTS] + [None], dtype=object)
+    return {
+        "years": bins.tolist(),
+        "counts": {RESULT_LABELS[r]: counts[:, i].tolist() for i, r in enumerate(RESULTS)},
+        "dates": [str(d) for d in dates[order]],
+        "results": labels[codes[order]].tolist(),
+    }
+
+def bar_figure(traces, title, x_title, y_title, stacked=False):
+    """A Plotly figure as a plain dict, one bar trace per (name, x, y)."""
+    return {
+        "data": [{"type": "bar", "name": name, "x": list(x), "y": list(y), "marker": {"color": COLORS.get(name)}}
+                 for name, x, y in traces],
+        "layout": {"title": {"text": title}, "barmode": "stack" if stacked else "relative",
+                   "xaxis": {"title": {"text": x_title}}, "yaxis": {"title": {"text": y_title}}},
+    }
+
+def _outcome_figure(values, title, y_title):
+    # One single-bar trace per outcome, as px.bar(color=...) drew it.
+    return bar_figure([(k, [k], [v]) for k, v in values.items()], title, "Outcome", y_title)
+
+def _outcome_chart(values, y_title):
+    # One column per outcome with its value on its own row, so each bar
+    # takes that outcome's colour.
+    outcomes = list(values)
+    chart = pd.DataFrame(np.diag(list(values.values())), columns=outcomes, index=pd.Index(outcomes, name="Outcome"))
+    st.bar_chart(chart, y_label=y_title, color=[COLORS[o] for o in outcomes], stack=True)
+
+def render_model_confidence(conf_dict, key=None):
     st.subheader("🤖 Model Confidence")
-    st.plotly_chart(
-        px.bar(
-            x=list(conf_dict.keys()),
-            y=list(conf_dict.values()),
-            labels={"x": "Outcome", "y": "Confidence"},
-            title="Model Output Probabilities",
-            color=list(conf_dict.keys()),
-            color_discrete_map={"Home Win": "green", "Draw": "yellow", "Away Win": "red"}
-        )
-    )
+    if VIEW_MODE == "light":
+        _outcome_chart(conf_dict, "Confidence")
+    else:
+        st.plotly_chart(cached("confidence", key, lambda: _outcome_figure(
+            conf_dict, "Model Output Probabilities", "Confidence")))
     for outcome, prob in conf_dict.items():
         st.markdown(f"**{outcome}**: {prob * 100:.2f}%")
 
-def render_historical_probabilities(probs):
+def render_historical_probabilities(probs, key=None):
     st.subheader("📚 Historical Probabilities")
     for outcome, pct in probs.items():
         st.markdown(f"**{outcome}**: {pct:.2f}%")
-    st.plotly_chart(
-        px.bar(
-            x=list(probs.keys()),
-            y=list(probs.values()),
-            labels={"x": "Outcome", "y": "Probability (%)"},
-            title="Historical Match Outcome Probabilities",
-            color=list(probs.keys()),
-            color_discrete_map={"Home Team Win": "green", "Draw": "yellow", "Away Team Win": "red"}
-        )
-    )
+    if VIEW_MODE == "light":
+        _outcome_chart(probs, "Probability (%)")
+    else:
+        st.plotly_chart(cached("historical", key, lambda: _outcome_figure(
+            probs, "Historical Match Outcome Probabilities", "Probability (%)")))
 
 def render_recent_form(home_team, away_team, home_form, away_form):
     st.subheader("📈 Recent Team Form (Last 5 Matches)")
     st.markdown(f"**{home_team}**: `{home_form}`")
     st.markdown(f"**{away_team}**: `{away_form}`")
 
-def render_head_to_head_history(h2h, home_team, away_team):
+def render_head_to_head_history(h2h, home_team, away_team, key=None):
     st.subheader("🔁 Head-to-Head Results")
-    df = h2h.copy()
-    result_col = 'FTR' if 'FTR' in df.columns else 'Res'
-    result_map = {'H': 'Home Win', 'D': 'Draw', 'A': 'Away Win'}
-    df['Result'] = df[result_col].map(result_map)
-    fig = px.histogram(
-        df, x='Date', color='Result',
-        title=f"{home_team} vs {away_team} - Head-to-Head",
-        color_discrete_map={"Home Win": "green", "Draw": "yellow", "Away Win": "red"}
-    )
-    st.plotly_chart(fig)
-    st.dataframe(df[['Date', 'Result']].sort_values(by='Date', ascending=False).reset_index(drop=True))
\ No newline at end of file
+    payload = cached("h2h", key, lambda: head_to_head_payload(h2h))
+    if VIEW_MODE == "light":
+        chart = pd.DataFrame(payload["counts"], index=pd.Index([str(y) for y in payload["years"]], name="Year"))
+        st.bar_chart(chart, y_label="Matches", color=[COLORS[c] for c in chart.columns], stack=True)
+    else:
+        st.plotly_chart(cached("h2h_figure", key, lambda: bar_figure(
+            [(name, payload["years"], counts) for name, counts in payload["counts"].items()],
+            f"{home_team} vs {away_team} - Head-to-Head",
+            "Date", "count", stacked=True)))
+    st.dataframe(pd.DataFrame({"Date": payload["dates"], "Result": payload["results"]}))